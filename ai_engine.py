@@ -1,15 +1,32 @@
+import os
 import re
+import threading
 import numpy as np
-import nltk
-from nltk.stem.snowball import SnowballStemmer
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
+from embedding_store import EmbeddingStore, EMBEDDING_CACHE_DIR
+from vector_index import build_index, normalize_rows, VECTOR_BACKEND, VECTOR_PRECISION
+from lexical_index import BM25Index
+from spatial_index import GridIndex
+from ttl_cache import TTLCache
 
-# Ensure NLTK data is present
-try:
-    nltk.data.find('tokenizers/punkt')
-except LookupError:
-    nltk.download('punkt')
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "1024"))
+HYBRID_ALPHA = 0.7          # weight of the cosine score in hybrid fusion
+HYBRID_PREFILTER_MIN = 50   # lexical candidates needed before dense scoring is restricted to them
+GEO_CELL_METERS = 250.0
+GEO_DEFAULT_RADIUS_M = 2000.0
+
+_nltk_checked = False
+
+def ensure_nltk_data():
+    """Ensure NLTK data is present (checked once, on first use rather than at import)."""
+    global _nltk_checked
+    if _nltk_checked:
+        return
+    import nltk
+    try:
+        nltk.data.find('tokenizers/punkt')
+    except LookupError:
+        nltk.download('punkt')
+    _nltk_checked = True
 
 class TextNormalizer:
     """
@@ -17,6 +34,8 @@ class TextNormalizer:
     Handles 'Blocklists' and 'Stemming' to clean noise from OSM/GTFS data.
     """
     def __init__(self, language="english"):
+        ensure_nltk_data()
+        from nltk.stem.snowball import SnowballStemmer
         self.stemmer = SnowballStemmer(language)
         # Transport-specific blocklist to remove noise
         self.blocklist = {
@@ -29,6 +48,13 @@ class TextNormalizer:
         """
         Splits text, removes stop words (Blocklist), and stems relevant concepts.
         """
+        return list(set(self.stem_tokens(text)))
+
+    def stem_tokens(self, text):
+        """
+        Same pipeline as clean_and_stem, but keeps token order and repeats
+        (term frequencies matter for BM25).
+        """
         if not text or not isinstance(text, str):
             return []
         
@@ -44,18 +70,64 @@ class TextNormalizer:
                 stemmed = self.stemmer.stem(w)
                 valid_concepts.append(stemmed)
                 
-        return list(set(valid_concepts))
+        return valid_concepts
+
+    @staticmethod
+    def normalize_query(text):
+        """
+        Light canonical form for cache keys: lowercase, punctuation stripped,
+        whitespace collapsed. Unlike clean_and_stem it keeps every word.
+        """
+        if not text or not isinstance(text, str):
+            return ""
+        return " ".join(re.sub(r'[^\w\s]', ' ', text.lower()).split())
+
+class QueryEmbeddingCache(TTLCache):
+    """TTLCache of query embeddings keyed on normalized query text."""
+    def __init__(self, maxsize=QUERY_CACHE_SIZE, ttl_seconds=None):
+        super().__init__(maxsize, ttl_seconds)
 
 class VectorSearchEngine:
     """
     Adapted from TVASemanticSearchTools.
-    Provides Vector Embedding and Cosine Similarity search.
+    Provides Vector Embedding and Cosine Similarity search
+    over a pluggable index (see vector_index.build_index).
     """
-    def __init__(self, model_name='all-MiniLM-L6-v2'):
+    def __init__(self, model_name='all-MiniLM-L6-v2', cache_dir=EMBEDDING_CACHE_DIR, index_backend=VECTOR_BACKEND,
+                 query_cache_size=QUERY_CACHE_SIZE, query_cache_ttl=None, precision=VECTOR_PRECISION):
         # Using a lighter model than TVA for Hackathon speed
-        self.model = SentenceTransformer(model_name)
+        self.model_name = model_name
+        self._model = None
+        self._model_lock = threading.Lock()
+        self.store = EmbeddingStore(model_name, cache_dir)
+        self.index_backend = index_backend
+        self.precision = precision
+        self.index = None
         self.cached_embeddings = None
         self.cached_metadata = []
+        self.query_cache = QueryEmbeddingCache(query_cache_size, query_cache_ttl)
+        self._normalizer = None
+        self.lexical = None
+        self.name_lookup = {}
+        self.geo_grid = None
+        self.geo_ids = np.empty(0, dtype=np.int64)
+
+    @property
+    def model(self):
+        # Loaded on first use (torch + sentence-transformers are imported here, not at module import);
+        # a warm embedding cache can serve the index without it
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    from sentence_transformers import SentenceTransformer
+                    self._model = SentenceTransformer(self.model_name)
+        return self._model
+
+    @property
+    def normalizer(self):
+        if self._normalizer is None:
+            self._normalizer = TextNormalizer()
+        return self._normalizer
 
     def encode_text(self, text_list):
         """Generates vector embeddings for a list of strings."""
@@ -71,35 +143,164 @@ class VectorSearchEngine:
                 val = obj.get(text_key)
                 corpus.append(str(val) if val is not None else "")
                 
-            self.cached_embeddings = self.model.encode(corpus, convert_to_tensor=True)
-            print(f"✅ Indexed {len(corpus)} items semantically.")
+            # Persistent cache: only new or changed descriptions hit the model
+            self.cached_embeddings, encoded = self.store.get_or_encode(
+                corpus, lambda texts: self.model.encode(texts, convert_to_numpy=True)
+            )
+            # Exact scan for small corpora, ANN (FAISS HNSW / NumPy IVF) for large ones
+            self.index = build_index(self.cached_embeddings, self.index_backend, self.precision) if corpus else None
+            # Lexical side: BM25 over normalizer stems plus an exact-name table
+            self.lexical = BM25Index([self.normalizer.stem_tokens(text) for text in corpus])
+            self.name_lookup = {}
+            for i, obj in enumerate(data_objects):
+                key = TextNormalizer.normalize_query(obj.get('name'))
+                if key:
+                    self.name_lookup.setdefault(key, []).append(i)
+            # Spatial grid over lat/lon metadata for geo-constrained search
+            coords = np.array([[obj.get('lat') if obj.get('lat') is not None else np.nan,
+                                obj.get('lon') if obj.get('lon') is not None else np.nan] for obj in data_objects],
+                              dtype=np.float64).reshape(-1, 2)
+            self.geo_ids = np.flatnonzero(~np.isnan(coords).any(axis=1))
+            self.geo_grid = GridIndex(coords[self.geo_ids, 0], coords[self.geo_ids, 1], cell_meters=GEO_CELL_METERS)
+            print(f"✅ Indexed {len(corpus)} items semantically ({encoded} newly encoded, {self.index.name if self.index else 'no'} index).")
 
-    def search(self, query, top_k=5):
+    def search(self, query, top_k=5, hybrid=True, center=None, radius_m=None, bbox=None, corridor=None):
         """
-        Performs Cosine Similarity search (TVA Logic).
+        Performs Cosine Similarity search (TVA Logic) through the vector index,
+        fused with BM25 keyword scores unless `hybrid` is False.
+        Optional spatial constraint (only POIs inside it are scored):
+          center=(lat, lon) with radius_m, bbox=(min_lat, min_lon, max_lat, max_lon),
+          or corridor=(path, width_m) with path as [[lon, lat], ...] like decode_polyline.
         """
-        if self.cached_embeddings is None:
+        restrict = self.region_candidates(center, radius_m, bbox, corridor)
+        if restrict is not None:
+            return self.hybrid_search(query, top_k, alpha=HYBRID_ALPHA if hybrid else 1.0, restrict=restrict)
+        if hybrid and self.lexical is not None:
+            return self.hybrid_search(query, top_k)
+        return self.search_many([query], top_k)[0]
+
+    def region_candidates(self, center=None, radius_m=None, bbox=None, corridor=None):
+        """Sorted ids of indexed items inside the given region, or None when unconstrained."""
+        if self.geo_grid is None or (center is None and bbox is None and corridor is None):
+            return None
+        if center is not None:
+            hits, _ = self.geo_grid.query_radius(center[0], center[1], radius_m or GEO_DEFAULT_RADIUS_M)
+        elif bbox is not None:
+            hits = self.geo_grid.query_bbox(*bbox)
+        else:
+            path, width_m = corridor
+            path = np.asarray(path, dtype=np.float64).reshape(-1, 2)
+            hits = self.geo_grid.query_corridor(path[:, 1], path[:, 0], width_m)
+        return np.sort(self.geo_ids[hits])
+
+    def hybrid_search(self, query, top_k=5, alpha=HYBRID_ALPHA, prefilter_min=HYBRID_PREFILTER_MIN, restrict=None):
+        """
+        BM25 + vector retrieval.
+        1. A query equal to a POI name is answered from the name table (no model call).
+        2. BM25 over stems yields lexical candidates; when there are at least
+           `prefilter_min` of them only those are dense-scored, otherwise they
+           are widened with the vector index's own top hits.
+        3. Scores are fused as alpha * cosine + (1 - alpha) * max-normalized BM25.
+           With a compressed index the cosine comes from its codes, and the
+           fused top `rerank_factor * top_k` are re-scored at full precision.
+        `restrict` (sorted ids, e.g. from region_candidates) limits scoring to that set.
+        """
+        if self.index is None:
             return []
+
+        if alpha < 1.0:
+            name_hits = self.name_lookup.get(TextNormalizer.normalize_query(query), [])
+            if restrict is not None:
+                in_region = set(restrict.tolist())
+                name_hits = [i for i in name_hits if i in in_region]
+            if name_hits:
+                return [self._item(i, 1.0, match_type='name') for i in name_hits[:top_k]]
+
+        lex_ids, lex_scores = self.lexical.search(self.normalizer.stem_tokens(query))
+        query_vec = self.encode_queries([query])[0]
+        if restrict is not None:
+            # The region is already a small candidate set: score all of it
+            keep = np.isin(lex_ids, restrict)
+            lex_ids, lex_scores = lex_ids[keep], lex_scores[keep]
+            cand = restrict
+        elif len(lex_ids) >= prefilter_min:
+            cand = lex_ids
+        else:
+            _, dense_ids = self.index.search(query_vec.reshape(1, -1), max(top_k * 4, prefilter_min))
+            cand = np.union1d(lex_ids, dense_ids[0][dense_ids[0] >= 0])
+        if not len(cand):
+            return []
+
+        query_vec = normalize_rows(query_vec)[0]
+        full_scores = lambda ids: (normalize_rows(self.cached_embeddings[ids]) @ query_vec).astype(np.float32)
+        # A compressed index scores every candidate from its codes, like search() does
+        codec = getattr(self.index, "codec", None)
+        compressed = codec is not None and codec.lossy
+        dense = self.index.score_ids(query_vec, cand).astype(np.float32) if compressed else full_scores(cand)
+        bm25 = np.zeros(len(cand), dtype=np.float32)
+        bm25[np.searchsorted(cand, lex_ids)] = lex_scores
+        if bm25.max() > 0:
+            bm25 /= bm25.max()
+        fused = alpha * dense + (1 - alpha) * bm25
+        order = np.argsort(-fused)
+        if compressed:
+            # ... and the fused shortlist is re-scored at full precision
+            order = order[:top_k * self.index.rerank_factor]
+            dense[order] = full_scores(cand[order])
+            fused[order] = alpha * dense[order] + (1 - alpha) * bm25[order]
+            order = order[np.argsort(-fused[order])]
+
+        results = []
+        for pos in order[:top_k]:
+            if fused[pos] > 0.25: # Threshold to reduce noise
+                results.append(self._item(int(cand[pos]), fused[pos], match_type='hybrid',
+                                          vector_score=float(dense[pos]), bm25_score=float(bm25[pos])))
+        return results
+
+    def search_many(self, queries, top_k=5, batch_size=256):
+        """
+        Batched search: all queries are encoded in one forward pass and scored
+        against the index together. Returns one ranked result list per query.
+        """
+        if self.index is None or not queries:
+            return [[] for _ in queries]
         
-        # Encode query
-        query_vec = self.model.encode(query, convert_to_tensor=True)
-        
-        # Calculate Cosine Similarity
-        # Move to CPU for numpy operations if using Torch
-        query_vec = query_vec.cpu().numpy().reshape(1, -1)
-        corpus_vecs = self.cached_embeddings.cpu().numpy()
-        
-        scores = cosine_similarity(query_vec, corpus_vecs)[0]
-        
-        # Sort results
-        top_indices = np.argsort(scores)[-top_k:][::-1]
-        
+        query_vecs = self.encode_queries(queries, batch_size)
+        scores, ids = self.index.search(query_vecs, top_k)
+        return [self._collect(row_scores, row_ids) for row_scores, row_ids in zip(scores, ids)]
+
+    def encode_queries(self, queries, batch_size=256):
+        """
+        Query embeddings through the LRU cache: repeated (normalized) queries
+        skip the model, and all misses are encoded together in one batch.
+        The normalized form is only the cache key; the model sees the query
+        as typed (the first spelling seen for a key).
+        """
+        keys = [TextNormalizer.normalize_query(q) for q in queries]
+        vecs = [self.query_cache.get(k) for k in keys]
+        originals = {}
+        for q, k, v in zip(queries, keys, vecs):
+            if v is None:
+                originals.setdefault(k, q)
+        missing = list(originals)
+        if missing:
+            fresh = self.model.encode(list(originals.values()), batch_size=batch_size, convert_to_numpy=True)
+            fresh = dict(zip(missing, fresh))
+            for k, v in fresh.items():
+                self.query_cache.put(k, v)
+            vecs = [fresh[k] if v is None else v for k, v in zip(keys, vecs)]
+        return np.vstack(vecs)
+
+    def _item(self, idx, score, **extra):
+        item = dict(self.cached_metadata[idx])
+        item['similarity_score'] = float(score)
+        item.update(extra)
+        return item
+
+    def _collect(self, scores, ids):
         results = []
-        for idx in top_indices:
-            score = scores[idx]
-            if score > 0.25: # Threshold to reduce noise
-                item = self.cached_metadata[idx]
-                item['similarity_score'] = float(score)
-                results.append(item)
+        for score, idx in zip(scores, ids):
+            if idx >= 0 and score > 0.25: # Threshold to reduce noise
+                results.append(self._item(idx, score))
                 
-        return results
\ No newline at end of file
+        return results
@@ -0,0 +1,127 @@
+import os
+import time
+import atexit
+import threading
+import numpy as np
+
+from embedding_store import EMBEDDING_CACHE_DIR, MatrixFile
+
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "1000"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", str(7 * 24 * 3600)))
+# Cosine similarity above which two questions are treated as the same question
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.92"))
+# Writes are batched: at most one save per interval, plus one at exit
+ANSWER_CACHE_SAVE_SECONDS = float(os.getenv("ANSWER_CACHE_SAVE_SECONDS", "30"))
+
+
+class SemanticAnswerCache:
+    """
+    LLM answers keyed by the meaning of the question.
+    A lookup embeds the question and returns the stored answer of the most
+    similar cached question in the same `scope` if the cosine similarity
+    reaches `threshold`. Scopes hold the exact part of a key (e.g. rounded
+    origin/destination and time bucket), so only the free text is fuzzy.
+    Entries expire after `ttl_seconds`; beyond `maxsize` the least recently
+    used go first. Question vectors and entries persist through MatrixFile
+    (the EmbeddingStore format), saved at most every `save_interval` seconds.
+    """
+    def __init__(self, name, model_name, encode_fn, threshold=ANSWER_CACHE_THRESHOLD,
+                 maxsize=ANSWER_CACHE_SIZE, ttl_seconds=ANSWER_CACHE_TTL, cache_dir=EMBEDDING_CACHE_DIR,
+                 save_interval=ANSWER_CACHE_SAVE_SECONDS):
+        self.model_name = model_name
+        self.encode_fn = encode_fn
+        self.threshold = threshold
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self.save_interval = save_interval
+        self.file = MatrixFile(f"answers-{name}-{model_name}", cache_dir)
+        self._lock = threading.Lock()
+        self.entries = []
+        self.vectors = np.empty((0, 0), dtype=np.float32)
+        self.hits = 0
+        self.misses = 0
+        self._dirty = False
+        self._saved_at = time.monotonic()
+        self._load()
+        atexit.register(self.flush)
+
+    def _embed(self, text):
+        vec = np.asarray(self.encode_fn([text]), dtype=np.float32)[0]
+        return vec / max(float(np.linalg.norm(vec)), 1e-12)
+
+    def get(self, question, scope=""):
+        """Cached answer for a question close enough to `question` in `scope`, else None."""
+        vec = self._embed(question)
+        with self._lock:
+            self._expire()
+            rows = [i for i, e in enumerate(self.entries) if e["scope"] == scope]
+            if rows and self.vectors.shape[1] == len(vec):
+                sims = self.vectors[rows] @ vec
+                best = int(np.argmax(sims))
+                if sims[best] >= self.threshold:
+                    entry = self.entries[rows[best]]
+                    entry["used"] = time.time()
+                    self.hits += 1
+                    return entry["answer"]
+            self.misses += 1
+            return None
+
+    def put(self, question, answer, scope=""):
+        vec = self._embed(question)
+        now = time.time()
+        with self._lock:
+            if self.vectors.shape[1] not in (0, len(vec)):
+                self.entries, self.vectors = [], np.empty((0, 0), dtype=np.float32)
+            self.entries.append({"question": question, "scope": scope, "answer": answer, "created": now, "used": now})
+            self.vectors = np.vstack([self.vectors.reshape(-1, len(vec)), vec[None, :]])
+            self._expire()
+            if len(self.entries) > self.maxsize:
+                order = np.argsort([e["used"] for e in self.entries], kind="stable")
+                self._keep(np.sort(order[len(self.entries) - self.maxsize:]))
+            self._dirty = True
+            if time.monotonic() - self._saved_at >= self.save_interval:
+                self._save()
+
+    def flush(self):
+        """Writes pending entries now (also run at interpreter exit)."""
+        with self._lock:
+            if self._dirty:
+                self._save()
+
+    def clear(self):
+        with self._lock:
+            self.entries, self.vectors = [], np.empty((0, 0), dtype=np.float32)
+            self._dirty = True
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {"size": len(self.entries), "hits": self.hits, "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0}
+
+    def _expire(self):
+        if self.ttl_seconds is None or not self.entries:
+            return
+        cutoff = time.time() - self.ttl_seconds
+        fresh = [i for i, e in enumerate(self.entries) if e["created"] >= cutoff]
+        if len(fresh) < len(self.entries):
+            self._keep(fresh)
+
+    def _keep(self, rows):
+        self.entries = [self.entries[i] for i in rows]
+        self.vectors = self.vectors[np.asarray(rows, dtype=np.int64)]
+
+    def _load(self):
+        matrix, meta = self.file.read()
+        if matrix is None or meta.get("model") != self.model_name or len(meta.get("entries") or []) != len(matrix):
+            return
+        self.vectors = np.array(matrix)
+        self.entries = meta["entries"]
+        self._expire()
+
+    def _save(self):
+        self._saved_at = time.monotonic()
+        try:
+            self.file.write(self.vectors, {"model": self.model_name, "entries": self.entries})
+            self._dirty = False
+        except OSError as e:
+            print(f"⚠️ Answer cache not written: {e}")
@@ -1,22 +1,29 @@
+import time
+IMPORT_STARTED = time.perf_counter()
 import streamlit as st
 import streamlit.components.v1 as components
 import os
 import json
-import requests
 import pandas as pd
 import pydeck as pdk
-import time
-from datetime import datetime, timedelta
-from groq import Groq
-from google.transit import gtfs_realtime_pb2
-from neo4j import GraphDatabase
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 from streamlit_js_eval import get_geolocation
 from streamlit_searchbox import st_searchbox 
 
-from ai_engine import VectorSearchEngine
-from etl_neo4j import run_neo4j_import
-from etl_enrich import run_enrichment
+# Heavy dependencies (torch, sentence-transformers, nltk, neo4j, groq, protobuf bindings)
+# are imported lazily inside the functions / warm-up tasks that need them.
 from etl_static import load_static_lookups 
+from startup import Warmup
+from live_feed import VehicleFeedPoller
+from read_model import GraphReadModel
+from graph_snapshot import GraphSnapshot
+from gazetteer import Gazetteer, PlaceSearch, RemoteGeocoder, SEARCH_DEBOUNCE_MS, as_option
+from planner import TripPlanner
+from answer_cache import SemanticAnswerCache
+from route_geometry import decode_polylines, simplify_segments
+from map_view import DEFAULT_VIEW, MIN_ZOOM, MAX_ZOOM, fit_view, prepare_points, view_key
+IMPORT_SECONDS = time.perf_counter() - IMPORT_STARTED
 
 # --- CONFIGURATION ---
 st.set_page_config(layout="wide", page_title="Helsinki AI Navigator", page_icon="🧠")
@@ -56,99 +63,111 @@ NEO4J_URI = os.getenv("NEO4J_URI", "bolt://localhost:7687")
 NEO4J_AUTH = (os.getenv("NEO4J_USER", "neo4j"), os.getenv("NEO4J_PASSWORD", "password123"))
 GROQ_KEY = os.getenv("GROQ_API_KEY")
 HSL_KEY = os.getenv("DIGITRANSIT_API_KEY")
+VIBE_RADIUS_M = float(os.getenv("VIBE_RADIUS_M", "3000"))
+ITINERARY_CACHE_TTL = float(os.getenv("ITINERARY_CACHE_TTL", "3600"))
 
 # --- STATE ---
 if 'start_loc' not in st.session_state: st.session_state['start_loc'] = None
 if 'end_loc' not in st.session_state: st.session_state['end_loc'] = None
 if 'semantic_pois' not in st.session_state: st.session_state['semantic_pois'] = None
+if 'semantic_layer' not in st.session_state: st.session_state['semantic_layer'] = None
 if 'route_geometry' not in st.session_state: st.session_state['route_geometry'] = None
 if 'use_fallback_line' not in st.session_state: st.session_state['use_fallback_line'] = False
 
 # --- LOADERS ---
-@st.cache_resource
-def get_driver():
-    try: return GraphDatabase.driver(NEO4J_URI, auth=NEO4J_AUTH)
-    except: return None
-driver = get_driver()
-
-@st.cache_resource
-def get_static_data():
-    return load_static_lookups()
-routes_dict, trip_lookup, direction_lookup = get_static_data()
+def connect_neo4j():
+    from neo4j import GraphDatabase
+    return GraphDatabase.driver(NEO4J_URI, auth=NEO4J_AUTH)
+
+def build_graph_snapshot(warmup):
+    driver = warmup.result("neo4j", timeout=None)
+    if not driver: raise RuntimeError("Neo4j is not connected")
+    return GraphSnapshot.from_driver(driver)
+
+def build_poi_index(warmup, engine):
+    # Fails (rather than indexing nothing) when the graph is unavailable, so it can be retried
+    snapshot = warmup.result("graph", timeout=None)
+    if not snapshot: raise RuntimeError(f"graph snapshot unavailable: {warmup.errors.get('graph', 'not loaded')}")
+    pois = snapshot.poi_records()
+    if pois: engine.fit_index(pois, text_key='description')
+    return len(pois)
+
+def build_raptor_planner(warmup):
+    from raptor import load_raptor_planner
+    snapshot = warmup.result("graph", timeout=None)
+    walk_links = snapshot.walk_links() if snapshot else None
+    if not walk_links:
+        print("⚠️ WALKABLE_TO links unavailable, inferring transfers from stops.txt")
+    return load_raptor_planner(walk_links=walk_links or None)
 
 @st.cache_resource
 def get_semantic_engine():
+    from ai_engine import VectorSearchEngine
     return VectorSearchEngine()
+
+@st.cache_resource
+def get_warmup():
+    """Process-wide background warm-up: the UI renders immediately, features light up as these finish."""
+    warmup = Warmup()
+    warmup.record("imports", IMPORT_SECONDS)
+    engine = get_semantic_engine()
+    warmup.submit("neo4j", connect_neo4j)
+    warmup.submit("gtfs_lookups", load_static_lookups)
+    warmup.submit("model", lambda: engine.model)
+    # Submitted before its readers, so they never wait on a task that has no worker yet
+    warmup.submit("graph", build_graph_snapshot, warmup)
+    warmup.submit("poi_index", build_poi_index, warmup, engine)
+    warmup.submit("raptor", build_raptor_planner, warmup)
+    return warmup
+warmup = get_warmup()
 ai_engine = get_semantic_engine()
 
-if ai_engine.cached_embeddings is None and driver:
-    with driver.session() as session:
-        query = "MATCH (p:PointOfInterest) RETURN p.name as name, p.description as description, p.lat as lat, p.lon as lon"
-        result = session.run(query)
-        pois = [r.data() for r in result]
-        if pois: ai_engine.fit_index(pois, text_key='description')
+def get_driver():
+    return warmup.result("neo4j")
+
+EMPTY_LOOKUPS = ({}, {}, {})
 
+def static_lookups():
+    # Degraded (empty) lookups until the GTFS parse finishes: vehicles show raw route ids
+    return warmup.result("gtfs_lookups", EMPTY_LOOKUPS)
 
 
 # --- LOGIC ---
 
+@st.cache_resource
+def get_place_search():
+    return PlaceSearch(RemoteGeocoder(HSL_KEY))
+
+def build_gazetteer(snapshot):
+    return Gazetteer(snapshot.place_entries())
+
 def search_hsl_places(searchterm: str):
+    # Local Stop/POI names answer most keystrokes; the geocoder is a cached fallback
     if not searchterm: return []
-    url = "https://api.digitransit.fi/geocoding/v1/search"
-    params = {"text": searchterm, "size": 5, "digitransit-subscription-key": HSL_KEY}
-    try:
-        resp = requests.get(url, params=params)
-        if resp.status_code == 200:
-            return [(f['properties']['label'], json.dumps({"name": f['properties']['label'], "lat": f['geometry']['coordinates'][1], "lon": f['geometry']['coordinates'][0]})) for f in resp.json()['features']]
-    except: return []
-    return []
-
-def decode_polyline(polyline_str):
-    """Standard Google Polyline Decoder"""
-    index, lat, lng = 0, 0, 0
-    coordinates = []
-    changes = {'latitude': 0, 'longitude': 0}
-    while index < len(polyline_str):
-        for unit in ['latitude', 'longitude']:
-            shift, result = 0, 0
-            while True:
-                byte = ord(polyline_str[index]) - 63
-                index += 1
-                result |= (byte & 0x1f) << shift
-                shift += 5
-                if not byte >= 0x20: break
-            if (result & 1): changes[unit] = ~(result >> 1)
-            else: changes[unit] = (result >> 1)
-        lat += changes['latitude']
-        lng += changes['longitude']
-        coordinates.append([lng / 100000.0, lat / 100000.0])
-    return coordinates
-
-def get_hsl_route(start, end):
+    snapshot = get_graph_snapshot()
+    local = get_read_model().get("gazetteer", lambda driver: build_gazetteer(snapshot)) if snapshot else None
+    return [as_option(e) for e in get_place_search().search(searchterm, local)]
+
+@st.cache_resource
+def get_planner():
+    # The offline GTFS planner joins in once its warm-up task has loaded the timetable
+    return TripPlanner(HSL_KEY, local_fn=lambda: warmup.result("raptor"))
+
+def get_hsl_route(planner, start, end, departure_time=None):
     """
     EXPERT ROUTE FETCHER:
     Returns geometry following roads/tracks.
     """
     if not start or not end: return None
-    url = "https://api.digitransit.fi/routing/v1/routers/hsl/index/graphql"
-    
-    query = """
-    { plan(from: {lat: %f, lon: %f}, to: {lat: %f, lon: %f}, numItineraries: 1) {
-        itineraries { legs { mode legGeometry { points } } }
-    } }
-    """ % (start['lat'], start['lon'], end['lat'], end['lon'])
-    
-    headers = {"Content-Type": "application/json", "digitransit-subscription-key": HSL_KEY}
     try:
-        resp = requests.post(url, json={"query": query}, headers=headers)
-        data = resp.json()
+        itins = planner.plan(start, end, departure_time)
         path_segments = []
         
-        if 'data' in data and data['data']['plan']['itineraries']:
-            legs = data['data']['plan']['itineraries'][0]['legs']
-            for leg in legs:
-                points = decode_polyline(leg['legGeometry']['points'])
-                
+        if itins:
+            legs = itins[0]['legs']
+            # All legs decoded in one batch; simplified per zoom when drawn
+            paths = decode_polylines([leg['legGeometry']['points'] for leg in legs])
+            for leg, points in zip(legs, paths):
                 color = [0, 180, 255] # Bus/Default (Blue)
                 if leg['mode'] == 'TRAM': color = [50, 255, 100] # Green
                 elif leg['mode'] == 'SUBWAY': color = [255, 140, 0] # Orange
@@ -156,26 +175,20 @@ def get_hsl_route(start, end):
                 elif leg['mode'] == 'FERRY': color = [0, 200, 255] # Cyan
                 elif leg['mode'] == 'WALK': color = [200, 200, 200] # Grey
                 
-                path_segments.append({"path": points, "color": color})
+                path_segments.append({"path": points.tolist(), "color": color})
             return path_segments
         else:
             return None
     except: 
         return None
 
-def get_planned_itinerary(start, end, departure_time=None):
+def get_planned_itinerary(planner, start, end, departure_time=None):
     if not start or not end: return "Error: Missing location data."
-    time_mode = f'dateTime: "{departure_time.strftime("%Y-%m-%dT%H:%M:%S")}+02:00"' if departure_time else ""
-    query = """
-    { plan(from: {lat: %f, lon: %f}, to: {lat: %f, lon: %f}, numItineraries: 2, %s) {
-        itineraries { duration legs { mode startTime route { shortName } from { name } to { name } } }
-    } }
-    """ % (float(start['lat']), float(start['lon']), float(end['lat']), float(end['lon']), time_mode)
-    
     try:
-        resp = requests.post("https://api.digitransit.fi/routing/v1/routers/hsl/index/graphql", json={"query": query}, headers={"Content-Type": "application/json", "digitransit-subscription-key": HSL_KEY})
-        itins = resp.json()['data']['plan']['itineraries']
-        context_str = "OFFICIAL HSL SCHEDULE:\n"
+        # Same cached plan() answer the map route was drawn from
+        itins = planner.plan(start, end, departure_time)
+        offline = bool(itins) and itins[0].get('source') == "offline"
+        context_str = "HSL TIMETABLE (offline planner):\n" if offline else "OFFICIAL HSL SCHEDULE:\n"
         for i, itin in enumerate(itins):
             context_str += f"Option {i+1} ({int(itin['duration']/60)} min):\n"
             for leg in itin['legs']:
@@ -185,9 +198,25 @@ def get_planned_itinerary(start, end, departure_time=None):
         return context_str
     except Exception as e: return f"Planner Error: {str(e)}"
 
+@st.cache_resource
+def get_answer_caches():
+    engine = get_semantic_engine()
+    encode = lambda texts: engine.encode_queries(texts)
+    return {
+        "general": SemanticAnswerCache("general", engine.model_name, encode),
+        "itinerary": SemanticAnswerCache("itinerary", engine.model_name, encode, ttl_seconds=ITINERARY_CACHE_TTL),
+    }
+
+def answer_cache(name):
+    # Consulted only once the embedding model is warm, so an answer never waits for model loading
+    return get_answer_caches()[name] if warmup.ready("model") else None
+
 def ask_general_llm(query):
     if not GROQ_KEY: return "AI service offline."
-    client = Groq(api_key=GROQ_KEY)
+    cache = answer_cache("general")
+    cached = cache.get(query) if cache else None
+    if cached is not None: return cached
+    client = get_groq_client()
     prompt = f"""
     You are a Helsinki Transport Expert.
     User Question: "{query}"
@@ -199,20 +228,66 @@ def ask_general_llm(query):
     """
     try:
         resp = client.chat.completions.create(model="llama-3.3-70b-versatile", messages=[{"role": "user", "content": prompt}])
-        return resp.choices[0].message.content
+        answer = resp.choices[0].message.content
+        if cache: cache.put(query, answer)
+        return answer
     except: return "Service unavailable."
 
-def ask_llm(query, start, end, semantic_pois=None, planned_time=None):
-    if not GROQ_KEY: return "AI Offline."
-    client = Groq(api_key=GROQ_KEY)
-    target_name = end['name']
-    dest_desc = "Point of Interest"
+@st.cache_resource
+def get_groq_client():
+    from groq import Groq
+    return Groq(api_key=GROQ_KEY)
+
+@st.cache_resource
+def get_pipeline_pool():
+    """Workers for the independent Find Route steps (vibe search, route geometry, schedule)."""
+    return ThreadPoolExecutor(max_workers=8, thread_name_prefix="find-route")
+
+def stream_completion(prompt, error_text, on_complete=None):
+    """Yields the completion text chunk by chunk as Groq produces it; on_complete gets the full text."""
+    parts = []
+    try:
+        stream = get_groq_client().chat.completions.create(
+            model="llama-3.3-70b-versatile", messages=[{"role": "user", "content": prompt}], stream=True)
+        for chunk in stream:
+            delta = chunk.choices[0].delta.content
+            if delta:
+                parts.append(delta)
+                yield delta
+    except Exception:
+        yield error_text
+        return
+    if on_complete and parts: on_complete("".join(parts))
+
+def itinerary_target(end, semantic_pois=None):
+    """(end place, display name, description) the itinerary is planned to."""
     if semantic_pois is not None and not semantic_pois.empty:
         target_name = semantic_pois.iloc[0]['name']
         dest_desc = semantic_pois.iloc[0].get('description', '')
-        end = {'lat': semantic_pois.iloc[0]['lat'], 'lon': semantic_pois.iloc[0]['lon'], 'name': target_name}
+        return {'lat': semantic_pois.iloc[0]['lat'], 'lon': semantic_pois.iloc[0]['lon'], 'name': target_name}, target_name, dest_desc
+    return end, end['name'], "Point of Interest"
 
-    planner_data = get_planned_itinerary(start, end, planned_time)
+def ask_llm(query, start, end, semantic_pois=None, planned_time=None, schedule_fn=None):
+    """
+    Streams the itinerary. schedule_fn returns the schedule text (e.g. a prefetch's .result);
+    it is not waited on when a similar vibe was already answered for the same trip and time bucket.
+    """
+    if not GROQ_KEY:
+        yield "AI Offline."
+        return
+    end, target_name, dest_desc = itinerary_target(end, semantic_pois)
+
+    cache = answer_cache("itinerary")
+    question, scope = query or "itinerary", repr(get_planner().cache_key(start, end, planned_time))
+    cached = cache.get(question, scope) if cache else None
+    if cached is not None:
+        yield cached
+        return
+
+    planner_data = schedule_fn() if schedule_fn else get_planned_itinerary(get_planner(), start, end, planned_time)
+    # Stops, lines and places around the destination, from the in-process graph snapshot
+    snapshot = get_graph_snapshot()
+    neighbourhood = snapshot.context(float(end['lat']), float(end['lon']), target_name) if snapshot else ""
     prompt = f"""
     Role: Professional Helsinki Transport Guide.
     Task: Create a structured itinerary from {start['name']} to {target_name}.
@@ -220,6 +295,7 @@ def ask_llm(query, start, end, semantic_pois=None, planned_time=None):
     
     Data: 
     {planner_data}
+    {neighbourhood}
     
     Output strictly:
     - Departure: [Time] [Location]
@@ -227,54 +303,101 @@ def ask_llm(query, start, end, semantic_pois=None, planned_time=None):
     - Arrival: [Time]
     - Tip: Enjoy {dest_desc}.
     """
-    try:
-        resp = client.chat.completions.create(model="llama-3.3-70b-versatile", messages=[{"role": "user", "content": prompt}])
-        return resp.choices[0].message.content
-    except: return "AI Error."
+    # Answers written without a real schedule are not worth keeping
+    usable = cache and not planner_data.startswith(("Planner Error", "Error"))
+    remember = (lambda text: cache.put(question, text, scope)) if usable else None
+    yield from stream_completion(prompt, "AI Error.", remember)
+
+def find_vibes(engine, interest, start):
+    # Prefer vibes within reach of the starting point, widen to the whole city if none
+    results = []
+    if start:
+        results = engine.search(interest, top_k=5, center=(start['lat'], start['lon']), radius_m=VIBE_RADIUS_M)
+    if not results:
+        results = engine.search(interest, top_k=5)
+    return results
+
+@st.cache_resource
+def get_vehicle_poller():
+    """Shared by every session: one download + parse of the vehicle feed per tick, not one per user."""
+    return VehicleFeedPoller(HSL_KEY, static_lookups).start()
 
 def get_live_vehicles():
-    try:
-        resp = requests.get("https://realtime.hsl.fi/realtime/vehicle-positions/v2/hsl", headers={"digitransit-subscription-key": HSL_KEY}, timeout=2)
-        feed = gtfs_realtime_pb2.FeedMessage()
-        feed.ParseFromString(resp.content)
-        vehicles = []
-        for e in feed.entity:
-            if e.HasField('vehicle') and e.vehicle.position:
-                r_id = e.vehicle.trip.route_id.replace("HSL:", "").strip() if e.vehicle.trip.route_id else ""
-                t_id = e.vehicle.trip.trip_id.replace("HSL:", "").strip()
-                d_id = str(e.vehicle.trip.direction_id)
-                route_data = routes_dict.get(r_id, {"short": r_id, "mode": "BUS", "long": ""})
-                
-                headsign = trip_lookup.get(t_id)
-                if not headsign:
-                    headsign = direction_lookup.get((r_id, d_id))
-                if not headsign:
-                    headsign = "City Centre" if d_id == '1' else "Regional Terminus"
-                
-                mode = route_data['mode']
-                short = route_data['short']
-                tooltip = f"<b>{mode} {short}</b><br/>To: {headsign}"
-                
-                if mode == 'TRAM': color, radius = [0, 200, 100, 200], 40
-                elif mode == 'METRO': color, radius = [255, 140, 0, 200], 50
-                elif mode == 'TRAIN': color, radius = [200, 0, 0, 200], 50
-                elif mode == 'FERRY': color, radius = [0, 100, 255, 200], 60
-                else: color, radius = [0, 150, 255, 180], 30
-                
-                vehicles.append({"lat": e.vehicle.position.latitude, "lon": e.vehicle.position.longitude, "color": color, "radius": radius, "html_tooltip": tooltip})
-        return pd.DataFrame(vehicles)
-    except: return pd.DataFrame()
+    return get_vehicle_poller().snapshot().vehicles
+
+@st.cache_resource
+def get_read_model():
+    """Graph-derived views shared by all sessions, rebuilt only when the ETL bumps the graph generation."""
+    return GraphReadModel(get_driver)
+
+def load_graph_snapshot(driver):
+    # Readers never build the first snapshot themselves: until the warm-up task has it they get None
+    # (not cached), and the UI thread only re-reads the graph after the ETL moved the generation on
+    if not warmup.ready("graph"):
+        warmup.retry("graph")
+        return None
+    warm = warmup.result("graph")
+    if warm is None or warm.generation == get_read_model().generation():
+        return warm
+    return GraphSnapshot.from_driver(driver)
+
+def get_graph_snapshot():
+    """In-process Stop/Route/POI topology (CSR); None until the warm-up snapshot is loaded."""
+    return get_read_model().get("topology", load_graph_snapshot)
+
+def graph_poi_frame(snapshot):
+    df = snapshot.pois_frame()
+    if not df.empty:
+        df['html_tooltip'] = "<b>" + df['name'] + "</b><br/>" + df['desc'].fillna('Point of Interest')
+        df['color'] = [[255, 0, 128, 200]] * len(df)
+        df['radius'] = 30
+    return df
 
 def get_graph_pois():
-    if not driver: return pd.DataFrame()
-    with driver.session() as session:
-        result = session.run("MATCH (p:PointOfInterest) RETURN p.name as name, p.lat as lat, p.lon as lon, p.description as desc")
-        df = pd.DataFrame([r.data() for r in result])
-        if not df.empty:
-            df['html_tooltip'] = "<b>" + df['name'] + "</b><br/>" + df['desc'].fillna('Point of Interest')
-            df['color'] = [[255, 0, 128, 200]] * len(df)
-            df['radius'] = 30
-        return df
+    snapshot = get_graph_snapshot()
+    if snapshot is None: return pd.DataFrame()
+    return get_read_model().get("pois", lambda driver: graph_poi_frame(snapshot), pd.DataFrame())
+
+def poi_layer(p_df):
+    if p_df is None or p_df.empty or 'html_tooltip' not in p_df.columns: return None
+    return pdk.Layer(
+        "ScatterplotLayer", p_df,
+        get_position='[lon, lat]', get_fill_color='color', get_radius='radius',
+        pickable=True, stroked=True, get_line_color=[255,255,255]
+    )
+
+def get_graph_poi_layer(view):
+    # Clustered per view; reused across ticks until the view or the graph generation changes
+    pois, key = get_graph_pois(), view_key(view)
+    cached = st.session_state.get('poi_layer_cache')
+    if cached is None or cached[0] is not pois or cached[1] != key:
+        cached = (pois, key, poi_layer(prepare_points(pois, view, "places")))
+        st.session_state['poi_layer_cache'] = cached
+    return cached[2]
+
+def get_route_paths(route_geometry, zoom):
+    # Full-resolution geometry stays in session state; the browser gets a per-zoom simplification
+    cached = st.session_state.get('route_paths_cache')
+    if cached is None or cached[0] is not route_geometry or cached[1] != zoom:
+        cached = (route_geometry, zoom, simplify_segments(route_geometry, zoom))
+        st.session_state['route_paths_cache'] = cached
+    return cached[2]
+
+def current_view(zoom_choice):
+    """
+    Server-side initial viewport: fits start/destination when set, else the city centre.
+    pydeck_chart never reports the camera back, so this is only a guess and points are not culled to it.
+    """
+    points = [(loc['lat'], loc['lon']) for loc in (st.session_state['start_loc'], st.session_state['end_loc']) if loc]
+    if len(points) > 1:
+        view = fit_view(points)
+    elif points:
+        view = dict(DEFAULT_VIEW, lat=points[0][0], lon=points[0][1])
+    else:
+        view = dict(DEFAULT_VIEW)
+    if zoom_choice != "Auto":
+        view["zoom"] = zoom_choice
+    return view
 
 
 # --- UI ---
@@ -294,10 +417,10 @@ with col_left:
             st.session_state['start_loc'] = {"name": "My Location", "lat": loc['coords']['latitude'], "lon": loc['coords']['longitude']}
             st.success("GPS Locked")
 
-    start_json = st_searchbox(search_hsl_places, key="s1", placeholder="From...", label="Start")
+    start_json = st_searchbox(search_hsl_places, key="s1", placeholder="From...", label="Start", debounce=SEARCH_DEBOUNCE_MS)
     if start_json: st.session_state['start_loc'] = json.loads(start_json)
 
-    end_json = st_searchbox(search_hsl_places, key="s2", placeholder="To...", label="Destination")
+    end_json = st_searchbox(search_hsl_places, key="s2", placeholder="To...", label="Destination", debounce=SEARCH_DEBOUNCE_MS)
     if end_json: st.session_state['end_loc'] = json.loads(end_json)
 
     with st.expander("Preferred Time", expanded=False):
@@ -309,21 +432,50 @@ with col_left:
     interest = st.text_input("Vibe Search", placeholder="e.g. Quiet Library")
     
     if st.button("Find Route"):
+        # Independent steps run concurrently: vibe search, route geometry, and the schedule
+        # (which only waits for the search when a vibe replaces the destination).
+        start, end = st.session_state['start_loc'], st.session_state['end_loc']
+        # Cached resources are resolved here: worker threads have no ScriptRunContext for st.cache_resource
+        pool, planner, engine = get_pipeline_pool(), get_planner(), get_semantic_engine()
+        search_f = route_f = None
         found_pois = None
-        if interest:
-            results = ai_engine.search(interest, top_k=5)
+        if interest and warmup.failed("poi_index"):
+            st.toast(f"Vibe search unavailable ({warmup.errors.get('poi_index')}), routing without it", icon="⚠️")
+            # Rebuild in the background: the snapshot first if that is what failed
+            warmup.retry("graph")
+            warmup.retry("poi_index")
+        elif interest and not warmup.ready("poi_index"):
+            st.toast("Vibe search is still warming up, routing without it", icon="⏳")
+        elif interest:
+            search_f = pool.submit(find_vibes, engine, interest, start)
+        if start and end:
+            route_f = pool.submit(get_hsl_route, planner, start, end, planned_dt)
+
+        if search_f is not None:
+            results = search_f.result()
             if results:
                 found_pois = pd.DataFrame(results)
                 found_pois['html_tooltip'] = "<b>" + found_pois['name'] + "</b><br/>Match: " + interest
                 found_pois['color'] = [[255, 200, 0, 255]] * len(found_pois)
                 found_pois['radius'] = 50
                 st.session_state['semantic_pois'] = found_pois
+                st.session_state['semantic_layer'] = poi_layer(found_pois)
                 st.toast(f"Found {len(results)} vibes", icon="🎯")
-        
+
+        schedule_f = None
+        if start and GROQ_KEY and (end or found_pois is not None):
+            # Shares the route's in-flight planner request when the destination is unchanged
+            schedule_f = pool.submit(get_planned_itinerary, planner, start, itinerary_target(end, found_pois)[0], planned_dt)
+
+        # Stream the itinerary first; the route geometry is only needed once the map redraws
+        if start and (end or found_pois is not None):
+            with st.spinner("Processing..."), st.container(border=True):
+                st.write_stream(ask_llm(interest, start, end, found_pois, planned_dt, schedule_f.result if schedule_f else None))
+
         # ROUTE LOGIC
-        if st.session_state['start_loc'] and st.session_state['end_loc']:
+        if route_f is not None:
             with st.spinner("Calculating Path..."):
-                route_geo = get_hsl_route(st.session_state['start_loc'], st.session_state['end_loc'])
+                route_geo = route_f.result()
                 if route_geo:
                     st.session_state['route_geometry'] = route_geo
                     st.session_state['use_fallback_line'] = False
@@ -332,11 +484,6 @@ with col_left:
                     st.session_state['use_fallback_line'] = True
                     st.session_state['route_geometry'] = None
 
-        if st.session_state['start_loc']:
-            with st.spinner("Processing..."):
-                plan = ask_llm(interest, st.session_state['start_loc'], st.session_state['end_loc'], found_pois, planned_dt)
-                st.info(plan)
-
     st.markdown("---")
     st.markdown("### Ask the AI Navigator")
     general_q = st.text_input("Ask about fares, rules, etc.", placeholder="How much is a ticket?")
@@ -345,12 +492,20 @@ with col_left:
         st.success(ans)
 
     if st.button("Reload Data"):
+        driver = get_driver()
         if driver:
+            from etl_neo4j import run_neo4j_import
+            from etl_enrich import run_enrichment
             with st.spinner("Reloading..."):
                 run_neo4j_import(driver, HSL_KEY)
                 run_enrichment(driver)
+                get_read_model().invalidate()
                 st.success("Updated")
                 
+    with st.expander("Startup Timings", expanded=False):
+        st.caption("Warm-up complete" if warmup.done() else "Warming up in the background...")
+        st.dataframe(pd.DataFrame(warmup.report(), columns=["component", "seconds", "status"]), hide_index=True)
+
     st.markdown("""
     <div class='tech-footer'>
         POWERED BY NEURO-SYMBOLIC AI & KNOWLEDGE GRAPHS<br>
@@ -359,12 +514,14 @@ with col_left:
     """, unsafe_allow_html=True)
 
 with col_right:
+    zoom_choice = st.select_slider("Map zoom", options=["Auto"] + list(range(MIN_ZOOM, MAX_ZOOM + 1)), value="Auto")
+    view = current_view(zoom_choice)
     map_placeholder = st.empty()
     while True:
         layers = []
         
         # 1. LIVE VEHICLES
-        v_df = get_live_vehicles()
+        v_df = prepare_points(get_live_vehicles(), view, "vehicles")
         if not v_df.empty:
             layers.append(pdk.Layer(
                 "ScatterplotLayer", v_df,
@@ -372,23 +529,18 @@ with col_right:
                 pickable=True, auto_highlight=True, tooltip="html_tooltip"
             ))
 
-        # 2. POIs
+        # 2. POIs (layers are built once per search / graph generation, not per tick)
         if st.session_state['semantic_pois'] is not None:
-            p_df = st.session_state['semantic_pois']
+            p_layer = st.session_state['semantic_layer']
         else:
-            p_df = get_graph_pois()
-            
-        if not p_df.empty and 'html_tooltip' in p_df.columns:
-            layers.append(pdk.Layer(
-                "ScatterplotLayer", p_df,
-                get_position='[lon, lat]', get_fill_color='color', get_radius='radius',
-                pickable=True, stroked=True, get_line_color=[255,255,255]
-            ))
+            p_layer = get_graph_poi_layer(view)
+        if p_layer is not None:
+            layers.append(p_layer)
 
         # 3. ROUTE LINE (Standard Road Following)
         if st.session_state['route_geometry']:
             layers.append(pdk.Layer(
-                "PathLayer", data=st.session_state['route_geometry'],
+                "PathLayer", data=get_route_paths(st.session_state['route_geometry'], view["zoom"]),
                 get_path="path", get_color="color", width_scale=20, width_min_pixels=5, pickable=True
             ))
             
@@ -412,7 +564,7 @@ with col_right:
 
         deck = pdk.Deck(
             map_style="dark",
-            initial_view_state=pdk.ViewState(latitude=60.17, longitude=24.94, zoom=13),
+            initial_view_state=pdk.ViewState(latitude=view["lat"], longitude=view["lon"], zoom=view["zoom"]),
             layers=layers,
             tooltip={"html": "{html_tooltip}", "style": {"backgroundColor": "#2c3e50", "color": "white"}}
         )
@@ -0,0 +1,83 @@
+"""
+Recall@k / latency / memory benchmark for the vector index backends.
+
+    python bench_vector.py --items 200000 --k 10
+    python bench_vector.py --from-cache all-MiniLM-L6-v2
+
+Ground truth is exact float32 cosine search over the same corpus.
+"""
+import argparse
+import time
+import numpy as np
+
+from embedding_store import EmbeddingStore
+from vector_index import ExactIndex, IVFIndex, FaissIndex, faiss, normalize_rows
+
+
+def synthetic_corpus(n_items, dim=384, n_topics=500, seed=0):
+    """Clustered unit vectors, roughly shaped like sentence embeddings of POI descriptions."""
+    rng = np.random.default_rng(seed)
+    topics = rng.normal(size=(n_topics, dim)).astype(np.float32)
+    return normalize_rows(topics[rng.integers(0, n_topics, n_items)] + 0.6 * rng.normal(size=(n_items, dim)).astype(np.float32))
+
+
+def make_queries(corpus, n_queries, seed=1):
+    rng = np.random.default_rng(seed)
+    base = corpus[rng.choice(len(corpus), n_queries, replace=False)]
+    return normalize_rows(base + 0.3 * rng.normal(size=base.shape).astype(np.float32))
+
+
+def resident_bytes(index):
+    if hasattr(index, "vectors"):
+        return index.vectors.nbytes
+    return index.index.ntotal * index.index.d * 4
+
+
+def run(corpus, queries, k):
+    _, truth = ExactIndex(corpus).search(queries, k)
+
+    configs = [(f"exact/{p}", lambda p=p: ExactIndex(corpus, precision=p)) for p in ("float32", "float16", "int8")]
+    configs += [(f"ivf/{p}", lambda p=p: IVFIndex(corpus, precision=p)) for p in ("float32", "float16", "int8")]
+    if faiss is not None:
+        configs.append(("faiss-hnsw/float32", lambda: FaissIndex(corpus)))
+
+    print(f"{len(corpus)} items x {corpus.shape[1]} dims, {len(queries)} queries, k={k}")
+    print(f"{'backend':<20}{'build s':>9}{'MB':>9}{f'recall@{k}':>11}{'p50 ms':>9}{'p95 ms':>9}")
+    for name, build in configs:
+        started = time.perf_counter()
+        index = build()
+        build_s = time.perf_counter() - started
+
+        latencies, found = [], []
+        for q in queries:
+            t0 = time.perf_counter()
+            _, ids = index.search(q.reshape(1, -1), k)
+            latencies.append((time.perf_counter() - t0) * 1000)
+            found.append(ids[0])
+
+        recall = np.mean([len(set(f.tolist()) & set(t.tolist())) / k for f, t in zip(found, truth)])
+        p50, p95 = np.percentile(latencies, [50, 95])
+        print(f"{name:<20}{build_s:>9.2f}{resident_bytes(index) / 1e6:>9.1f}{recall:>11.3f}{p50:>9.2f}{p95:>9.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=100000, help="synthetic corpus size")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--from-cache", metavar="MODEL", help="benchmark the cached POI embeddings of MODEL instead")
+    args = parser.parse_args()
+
+    if args.from_cache:
+        corpus, _ = EmbeddingStore(args.from_cache).load()
+        if corpus is None:
+            raise SystemExit(f"No embedding cache for {args.from_cache}")
+        corpus = normalize_rows(corpus)
+    else:
+        corpus = synthetic_corpus(args.items)
+
+    run(corpus, make_queries(corpus, min(args.queries, len(corpus))), args.k)
+
+
+if __name__ == "__main__":
+    main()
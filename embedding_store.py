@@ -0,0 +1,130 @@
+import os
+import re
+import glob
+import json
+import uuid
+import hashlib
+import numpy as np
+
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".embedding_cache"))
+
+
+def text_hash(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class MatrixFile:
+    """
+    A float32 matrix plus JSON metadata, persisted as a pair that cannot tear.
+    The matrix goes to a generation-named raw file (opened with np.memmap) that
+    is never rewritten; the JSON sidecar names its generation and is the only
+    file replaced in place. A reader therefore always pairs a sidecar with the
+    matrix written for it. Older generations are removed after the swap, except
+    the previous one, which a reader may just be opening.
+    """
+    def __init__(self, name, cache_dir=EMBEDDING_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self.prefix = os.path.join(cache_dir, re.sub(r'[^\w.-]', '_', name))
+        self.meta_path = self.prefix + ".json"
+
+    def _matrix_path(self, generation):
+        return f"{self.prefix}.{generation}.f32"
+
+    def read(self):
+        """Returns (memmap matrix, metadata), or (None, None) if there is no usable file."""
+        try:
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            shape = (int(meta["rows"]), int(meta["dim"]))
+            path = self._matrix_path(meta["generation"])
+            if shape[0] == 0 or os.path.getsize(path) != shape[0] * shape[1] * 4:
+                return None, None
+            return np.memmap(path, dtype=np.float32, mode="r", shape=shape), meta
+        except (OSError, ValueError, KeyError, TypeError):
+            return None, None
+
+    def write(self, matrix, meta):
+        """Replaces the stored pair with `matrix` and `meta` (a JSON-able dict)."""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+        previous = None
+        try:
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                previous = json.load(f).get("generation")
+        except (OSError, ValueError, AttributeError):
+            pass
+        generation = uuid.uuid4().hex[:12]
+        path = self._matrix_path(generation)
+        matrix.tofile(path + ".tmp")
+        os.replace(path + ".tmp", path)
+        tmp_meta = self.meta_path + ".tmp"
+        with open(tmp_meta, "w", encoding="utf-8") as f:
+            json.dump(dict(meta, generation=generation, rows=int(matrix.shape[0]), dim=int(matrix.shape[1])), f)
+        os.replace(tmp_meta, self.meta_path)
+        keep = {path, self._matrix_path(previous)}
+        for old in glob.glob(self._matrix_path("*")) + glob.glob(self.prefix + ".f32"):
+            if old not in keep:
+                try:
+                    os.remove(old)
+                except OSError:
+                    pass
+
+
+class EmbeddingStore:
+    """
+    On-disk embedding cache for one model.
+    Vectors live in a raw float32 file opened with np.memmap; the sidecar holds
+    the model name and the content hash of every row (see MatrixFile).
+    """
+    def __init__(self, model_name, cache_dir=EMBEDDING_CACHE_DIR):
+        self.model_name = model_name
+        self.cache_dir = cache_dir
+        self.file = MatrixFile(model_name, cache_dir)
+
+    def load(self):
+        """Returns (memmap matrix, row hashes), or (None, []) if there is no usable cache."""
+        matrix, meta = self.file.read()
+        if matrix is None or meta.get("model") != self.model_name or len(meta.get("hashes") or []) != len(matrix):
+            return None, []
+        return matrix, meta["hashes"]
+
+    def save(self, matrix, hashes):
+        """Atomically replaces the cache with `matrix` (rows aligned with `hashes`)."""
+        self.file.write(matrix, {"model": self.model_name, "hashes": list(hashes)})
+
+    def get_or_encode(self, texts, encode_fn):
+        """
+        Returns a float32 matrix with one row per text. Rows whose text hash is
+        already cached are reused; only new or changed texts go through `encode_fn`.
+        When nothing changed the cached memmap is returned as-is.
+        """
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32), 0
+
+        hashes = [text_hash(t) for t in texts]
+        cached, cached_hashes = self.load()
+        if cached is not None and cached_hashes == hashes:
+            return cached, 0
+
+        row_of = {h: i for i, h in enumerate(cached_hashes)}
+        missing = [i for i, h in enumerate(hashes) if h not in row_of]
+
+        fresh = None
+        if missing:
+            # Encode each distinct missing text once
+            unique = list(dict.fromkeys(texts[i] for i in missing))
+            vecs = np.asarray(encode_fn(unique), dtype=np.float32)
+            fresh = {text_hash(t): vecs[k] for k, t in enumerate(unique)}
+
+        dim = cached.shape[1] if cached is not None else next(iter(fresh.values())).shape[0]
+        matrix = np.empty((len(texts), dim), dtype=np.float32)
+        for i, h in enumerate(hashes):
+            matrix[i] = cached[row_of[h]] if h in row_of else fresh[h]
+
+        try:
+            self.save(matrix, hashes)
+            mapped = self.load()[0]
+            return (mapped if mapped is not None else matrix), len(missing)
+        except OSError as e:
+            print(f"⚠️ Embedding cache not written: {e}")
+            return matrix, len(missing)
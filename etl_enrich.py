@@ -1,12 +1,16 @@
 import requests
 import pandas as pd
 import os
+import time
 import datetime
 from neo4j import GraphDatabase
 from ai_engine import TextNormalizer # Import the new Engine
+from graph_sync import sync_nodes, sync_relationships, report_throughput, bump_generation
+from spatial_index import GridIndex
 
 # --- CONFIG ---
 IMPORT_PATH = "/var/lib/neo4j/import"
+POI_RADIUS_METERS = float(os.getenv("POI_RADIUS_METERS", "400"))
 
 def log(message):
     timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -32,6 +36,47 @@ def fetch_landmarks_extended():
         log(f"Error fetching landmarks: {e}")
         return []
 
+def link_stops_to_pois(driver, radius=POI_RADIUS_METERS):
+    """
+    Spatial join Stop -> PointOfInterest done in Python with a grid index,
+    then diffed against the stored IS_NEAR edges and bulk-written.
+    Cost grows with stops + POIs instead of their product.
+    """
+    started = time.perf_counter()
+    with driver.session() as session:
+        stops = [r.data() for r in session.run(
+            "MATCH (s:Stop) WHERE s.lat IS NOT NULL RETURN s.id AS id, s.lat AS lat, s.lon AS lon")]
+        pois = [r.data() for r in session.run(
+            "MATCH (p:PointOfInterest) WHERE p.lat IS NOT NULL RETURN p.id AS id, p.lat AS lat, p.lon AS lon")]
+
+    grid = GridIndex([p['lat'] for p in pois], [p['lon'] for p in pois], cell_meters=radius)
+    stop_idx, poi_idx, dists = grid.pairs_between([s['lat'] for s in stops], [s['lon'] for s in stops], radius)
+    links = [
+        {"stop_id": stops[i]['id'], "poi_id": pois[j]['id'], "dist": round(float(d), 1)}
+        for i, j, d in zip(stop_idx.tolist(), poi_idx.tolist(), dists.tolist())
+    ]
+    report_throughput("IS_NEAR spatial join", len(stops) + len(pois), started)
+
+    return sync_relationships(
+        driver,
+        "MATCH (s:Stop)-[r:IS_NEAR]->(p:PointOfInterest) RETURN s.id AS stop_id, p.id AS poi_id, r.distance_meters AS dist",
+        links, ["stop_id", "poi_id"],
+        """
+        UNWIND $batch AS row
+        MATCH (s:Stop {id: row.stop_id})
+        MATCH (p:PointOfInterest {id: row.poi_id})
+        MERGE (s)-[r:IS_NEAR]->(p)
+        SET r.distance_meters = row.dist
+        """,
+        """
+        UNWIND $batch AS row
+        MATCH (s:Stop {id: row.stop_id})-[r:IS_NEAR]->(p:PointOfInterest {id: row.poi_id})
+        DELETE r
+        """,
+        value_field="dist",
+        label="IS_NEAR",
+    )
+
 def run_enrichment(driver):
     log("Starting Semantic Enrichment Process (Expert Mode)...")
     
@@ -42,8 +87,9 @@ def run_enrichment(driver):
     log(f"Fetched {len(landmarks)} raw POIs.")
 
     with driver.session() as session:
-        # A. Import Raw Landmarks
-        log("Creating PointOfInterest Nodes...")
+        # A. Sync Raw Landmarks (upsert changed, prune vanished)
+        log("Syncing PointOfInterest Nodes...")
+        session.run("CREATE CONSTRAINT IF NOT EXISTS FOR (p:PointOfInterest) REQUIRE p.id IS UNIQUE")
         landmark_query = """
         UNWIND $batch AS row
         MERGE (p:PointOfInterest {id: row.id})
@@ -51,19 +97,22 @@ def run_enrichment(driver):
             p.raw_type = row.tags.tourism, 
             p.lat = row.lat, 
             p.lon = row.lon,
-            p.description = row.tags.name + ' ' + coalesce(row.tags.tourism, '') + ' ' + coalesce(row.tags.historic, '')
+            p.description = row.tags.name + ' ' + coalesce(row.tags.tourism, '') + ' ' + coalesce(row.tags.historic, ''),
+            p.fingerprint = row.fingerprint
         """
         # Filter POIs that actually have names
         valid_pois = [x for x in landmarks if 'tags' in x and 'name' in x['tags']]
-        session.run(landmark_query, batch=valid_pois)
+        if valid_pois:
+            changed, removed = sync_nodes(driver, "PointOfInterest", valid_pois, ["tags", "lat", "lon"], landmark_query)
+            log(f"POIs: {len(changed)} upserted, {len(removed)} pruned, {len(valid_pois) - len(changed)} unchanged.")
+        else:
+            # An empty Overpass response is treated as an outage, not as "every POI vanished"
+            log("No POIs fetched, keeping existing PointOfInterest nodes.")
 
         # B. Spatial Inference (IS_NEAR)
         log("Inferring Spatial Links...")
-        session.run("""
-        MATCH (s:Stop), (p:PointOfInterest)
-        WHERE point.distance(point({latitude: s.lat, longitude: s.lon}), point({latitude: p.lat, longitude: p.lon})) < 400
-        MERGE (s)-[r:IS_NEAR]->(p)
-        """)
+        added, removed = link_stops_to_pois(driver)
+        log(f"IS_NEAR: {added} upserted, {removed} removed.")
 
         # C. Label Propagation (The TVA Logic)
         # We bubble up concepts: POI -> Stop -> Route
@@ -73,7 +122,7 @@ def run_enrichment(driver):
         result = session.run("""
             MATCH (s:Stop)-[:IS_NEAR]->(p:PointOfInterest)
             WHERE p.name IS NOT NULL
-            RETURN s.id as stop_id, collect(p.name + ' ' + coalesce(p.raw_type, '')) as poi_texts
+            RETURN s.id as stop_id, s.semantic_tags as current_tags, collect(p.name + ' ' + coalesce(p.raw_type, '')) as poi_texts
         """)
         
         stop_tags = []
@@ -81,19 +130,28 @@ def run_enrichment(driver):
             # Combine all text from nearby POIs
             combined_text = " ".join(record['poi_texts'])
             # Use TVA Normalizer to extract clean concepts (e.g., "art", "museum", "history")
-            concepts = normalizer.clean_and_stem(combined_text)
+            concepts = sorted(normalizer.clean_and_stem(combined_text))
             
-            if concepts:
+            # Only write stops whose concept set actually changed
+            if concepts and concepts != sorted(record['current_tags'] or []):
                 stop_tags.append({"id": record['stop_id'], "tags": concepts})
         
-        # 2. Write Tags back to Graph
+        # 2. Write changed Tags back to Graph
+        if stop_tags:
+            session.run("""
+                UNWIND $batch as row
+                MATCH (s:Stop {id: row.id})
+                SET s.semantic_tags = row.tags
+            """, batch=stop_tags)
+
+        # 3. Drop stale tags from stops that no longer have any nearby POI
         session.run("""
-            UNWIND $batch as row
-            MATCH (s:Stop {id: row.id})
-            SET s.semantic_tags = row.tags
-        """, batch=stop_tags)
+            MATCH (s:Stop)
+            WHERE s.semantic_tags IS NOT NULL AND NOT (s)-[:IS_NEAR]->(:PointOfInterest)
+            REMOVE s.semantic_tags
+        """)
         
-        log(f"Propagated labels to {len(stop_tags)} stops.")
+        log(f"Propagated labels to {len(stop_tags)} changed stops.")
         
         # D. Route Classification (Vibe Check)
         # If a Route serves many 'art' stops, it becomes an 'Art Route'
@@ -110,4 +168,5 @@ def run_enrichment(driver):
                 r.vibe_historic = size([x in all_tags WHERE x CONTAINS 'hist' OR x CONTAINS 'cath']) > 2
         """)
 
+    log(f"Graph generation {bump_generation(driver)}.")
     log("Enrichment Complete.")
\ No newline at end of file
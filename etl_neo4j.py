@@ -1,6 +1,21 @@
+import os
+import time
 import requests
 import math
-from neo4j import GraphDatabase
+from concurrent.futures import ThreadPoolExecutor
+from spatial_index import GridIndex
+from graph_sync import sync_nodes, sync_relationships, report_throughput, bump_generation
+
+# Max walking distance (meters) between two stops to infer a WALKABLE_TO link
+WALK_RADIUS_METERS = float(os.getenv("WALK_RADIUS_METERS", "150"))
+
+# HSL region (min_lat, min_lon, max_lat, max_lon): Siuntio/Kirkkonummi to Sipoo, Tuusula/Kerava to the coast
+HSL_BBOX = (59.90, 24.20, 60.55, 25.35)
+TILE_RADIUS_METERS = 3000
+STOP_PAGE_SIZE = 500
+FETCH_WORKERS = int(os.getenv("HSL_FETCH_WORKERS", "8"))
+FETCH_RETRIES = int(os.getenv("HSL_FETCH_RETRIES", "4"))
+FETCH_BACKOFF_SECONDS = float(os.getenv("HSL_FETCH_BACKOFF_SECONDS", "1.0"))
 
 def calculate_distance(lat1, lon1, lat2, lon2):
     R = 6371000 # Earth radius in meters
@@ -11,39 +26,107 @@ def calculate_distance(lat1, lon1, lat2, lon2):
     c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
     return R * c
 
-def run_neo4j_import(driver, api_key):
-    print("🚀 Building Semantic Knowledge Graph...")
-
-    url = "https://api.digitransit.fi/routing/v2/hsl/gtfs/v1"
-    query = """
-    {
-      stopsByRadius(lat: 60.171, lon: 24.941, radius: 1500, first: 200) {
-        edges {
-          node {
-            stop { 
-              gtfsId
-              name
-              lat
-              lon
-              routes {
-                gtfsId
-                shortName
-                mode
-              }
-            }
+STOPS_QUERY = """
+query ($lat: Float!, $lon: Float!, $radius: Int!, $first: Int!, $after: String) {
+  stopsByRadius(lat: $lat, lon: $lon, radius: $radius, first: $first, after: $after) {
+    pageInfo { hasNextPage endCursor }
+    edges {
+      node {
+        stop {
+          gtfsId
+          name
+          lat
+          lon
+          routes {
+            gtfsId
+            shortName
+            mode
           }
         }
       }
     }
+  }
+}
+"""
+
+def region_tiles(bbox=HSL_BBOX, tile_radius=TILE_RADIUS_METERS):
+    """Centres of radius-`tile_radius` circles that together cover the bounding box."""
+    min_lat, min_lon, max_lat, max_lon = bbox
+    # Circles on a square grid cover it fully when spacing = radius * sqrt(2)
+    step_m = tile_radius * math.sqrt(2)
+    step_lat = step_m / 111320.0
+    step_lon = step_m / (111320.0 * math.cos(math.radians((min_lat + max_lat) / 2)))
+    n_lat = max(1, math.ceil((max_lat - min_lat) / step_lat))
+    n_lon = max(1, math.ceil((max_lon - min_lon) / step_lon))
+    return [
+        (min_lat + (i + 0.5) * step_lat, min_lon + (j + 0.5) * step_lon)
+        for i in range(n_lat) for j in range(n_lon)
+    ]
+
+def post_graphql(http, url, payload, retries=FETCH_RETRIES, backoff=FETCH_BACKOFF_SECONDS):
     """
-    headers = {"Content-Type": "application/json", "digitransit-subscription-key": api_key}
-    
+    POSTs one GraphQL request and returns its `data`. HTTP errors (429, 5xx, ...)
+    and GraphQL `errors` are retried with exponential backoff, then raised:
+    a failed page must never look like an empty one.
+    """
+    for attempt in range(retries + 1):
+        try:
+            resp = http.post(url, json=payload, timeout=30)
+            resp.raise_for_status()
+            body = resp.json()
+            if body.get('errors'):
+                raise RuntimeError(f"GraphQL errors: {body['errors']}")
+            if body.get('data') is None:
+                raise RuntimeError("GraphQL response without data")
+            return body['data']
+        except (requests.RequestException, ValueError, RuntimeError):
+            if attempt == retries:
+                raise
+            time.sleep(backoff * (2 ** attempt))
+
+def fetch_stop_tile(http, url, lat, lon, radius, page_size=STOP_PAGE_SIZE):
+    """Follows the stopsByRadius cursor until the tile is exhausted. Raises if any page fails."""
+    stops, cursor = [], None
+    while True:
+        variables = {"lat": lat, "lon": lon, "radius": int(radius), "first": page_size, "after": cursor}
+        conn = post_graphql(http, url, {"query": STOPS_QUERY, "variables": variables}).get('stopsByRadius') or {}
+        stops.extend(e['node']['stop'] for e in conn.get('edges', []) if e['node'].get('stop'))
+        page = conn.get('pageInfo') or {}
+        if not page.get('hasNextPage') or not page.get('endCursor'):
+            return stops
+        cursor = page['endCursor']
+
+def fetch_region_stops(api_key, bbox=HSL_BBOX, tile_radius=TILE_RADIUS_METERS, workers=FETCH_WORKERS):
+    """
+    Fetches every stop in `bbox` as parallel, cursor-paginated tiles, de-duplicated by gtfsId.
+    A tile that still fails after retries aborts the whole fetch: the import
+    prunes stops that are not in the result, so a partial region must not be synced.
+    """
+    url = "https://api.digitransit.fi/routing/v2/hsl/gtfs/v1"
+    tiles = region_tiles(bbox, tile_radius)
+    http = requests.Session()
+    http.headers.update({"Content-Type": "application/json", "digitransit-subscription-key": api_key})
+    http.mount("https://", requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=workers))
+
+    min_lat, min_lon, max_lat, max_lon = bbox
+    stops = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for tile_stops in pool.map(lambda c: fetch_stop_tile(http, url, c[0], c[1], tile_radius), tiles):
+            for s in tile_stops:
+                # Tiles overlap each other and the bbox edge; keep one copy of in-region stops
+                if min_lat <= s['lat'] <= max_lat and min_lon <= s['lon'] <= max_lon:
+                    stops[s['gtfsId']] = s
+    return list(stops.values())
+
+def run_neo4j_import(driver, api_key, walk_radius=WALK_RADIUS_METERS, bbox=HSL_BBOX):
+    print("🚀 Building Semantic Knowledge Graph...")
+
     try:
-        response = requests.post(url, json={"query": query}, headers=headers)
-        data = response.json()
-        edges = data.get('data', {}).get('stopsByRadius', {}).get('edges', [])
+        started = time.perf_counter()
+        stop_nodes = fetch_region_stops(api_key, bbox)
+        report_throughput("Stop fetch", len(stop_nodes), started)
         
-        if not edges:
+        if not stop_nodes:
             print("⚠️ No data found.")
             return 0
 
@@ -53,8 +136,7 @@ def run_neo4j_import(driver, api_key):
         
         stop_cache = []
 
-        for edge in edges:
-            s_node = edge['node']['stop']
+        for s_node in stop_nodes:
             s_id = s_node['gtfsId']
             
             stops_list.append({
@@ -77,56 +159,86 @@ def run_neo4j_import(driver, api_key):
                 })
                 serves_rels.append({"route_id": r_id, "stop_id": s_id})
 
+        # Grid neighbour search: only stops in adjacent cells are compared
+        started = time.perf_counter()
+        grid = GridIndex([s['lat'] for s in stop_cache], [s['lon'] for s in stop_cache], cell_meters=walk_radius)
+        idx_a, idx_b, dists = grid.pairs_within(walk_radius)
+        # Each pair is stored once, oriented by id: row order follows the (parallel) tile fetch order,
+        # and a flipped edge would be deleted and recreated by the sync on every run
+        walk_links = [
+            {"a": min(a, b), "b": max(a, b), "dist": round(float(d), 1)}
+            for a, b, d in ((stop_cache[i]['gtfsId'], stop_cache[j]['gtfsId'], d)
+                            for i, j, d in zip(idx_a.tolist(), idx_b.tolist(), dists.tolist()))
+        ]
+        report_throughput("Walk link inference", len(stop_cache), started)
+
+        # Incremental refresh: upsert what changed, prune what disappeared.
+        # The graph (and its enriched POIs / semantic_tags) stays online throughout.
         with driver.session() as session:
-            session.run("MATCH (n) DETACH DELETE n")
-            
             session.run("CREATE CONSTRAINT IF NOT EXISTS FOR (s:Stop) REQUIRE s.id IS UNIQUE")
             session.run("CREATE CONSTRAINT IF NOT EXISTS FOR (r:Route) REQUIRE r.id IS UNIQUE")
 
-            print("... Creating Semantic Stop Nodes")
-            session.run("""
-            UNWIND $batch AS row
-            MERGE (s:Stop {id: row.id})
-            SET s.name = row.name, s.lat = row.lat, s.lon = row.lon, s.ontologyType = row.type
-            """, batch=stops_list)
+        print("... Syncing Semantic Stop Nodes")
+        changed_stops, removed_stops = sync_nodes(driver, "Stop", stops_list, ["name", "lat", "lon", "type"], """
+        UNWIND $batch AS row
+        MERGE (s:Stop {id: row.id})
+        SET s.name = row.name, s.lat = row.lat, s.lon = row.lon, s.ontologyType = row.type,
+            s.fingerprint = row.fingerprint
+        """)
 
-            print("... Creating Semantic Route Nodes")
-            unique_routes = {v['id']: v for v in routes_list}.values()
-            session.run("""
-            UNWIND $batch AS row
-            MERGE (r:Route {id: row.id})
-            SET r.name = row.name, r.mode = row.mode, r.ontologyType = row.type
-            """, batch=list(unique_routes))
+        print("... Syncing Semantic Route Nodes")
+        unique_routes = list({v['id']: v for v in routes_list}.values())
+        changed_routes, removed_routes = sync_nodes(driver, "Route", unique_routes, ["name", "mode", "type"], """
+        UNWIND $batch AS row
+        MERGE (r:Route {id: row.id})
+        SET r.name = row.name, r.mode = row.mode, r.ontologyType = row.type,
+            r.fingerprint = row.fingerprint
+        """)
 
-            print("... Linking Topology (OPERATES_ON)")
-            session.run("""
+        print("... Syncing Topology (OPERATES_ON)")
+        ops_added, ops_removed = sync_relationships(
+            driver,
+            "MATCH (r:Route)-[:OPERATES_ON]->(s:Stop) RETURN r.id AS route_id, s.id AS stop_id",
+            serves_rels, ["route_id", "stop_id"],
+            """
             UNWIND $batch AS row
             MATCH (r:Route {id: row.route_id})
             MATCH (s:Stop {id: row.stop_id})
             MERGE (r)-[:OPERATES_ON]->(s)
-            """, batch=serves_rels)
+            """,
+            """
+            UNWIND $batch AS row
+            MATCH (r:Route {id: row.route_id})-[rel:OPERATES_ON]->(s:Stop {id: row.stop_id})
+            DELETE rel
+            """,
+            label="OPERATES_ON",
+        )
 
-            print("... Inferring Spatial Relationships")
-            
-            walk_links = []
-            for i in range(len(stop_cache)):
-                for j in range(i + 1, len(stop_cache)):
-                    s1 = stop_cache[i]
-                    s2 = stop_cache[j]
-                    dist = calculate_distance(s1['lat'], s1['lon'], s2['lat'], s2['lon'])
-                    
-                    if dist < 150: # 150 meters
-                        walk_links.append({"a": s1['gtfsId'], "b": s2['gtfsId'], "dist": dist})
-
-            if walk_links:
-                session.run("""
-                UNWIND $batch AS row
-                MATCH (a:Stop {id: row.a})
-                MATCH (b:Stop {id: row.b})
-                MERGE (a)-[rel:WALKABLE_TO]->(b)
-                SET rel.distance_meters = row.dist
-                """, batch=walk_links)
+        print("... Syncing Spatial Relationships (WALKABLE_TO)")
+        walk_added, walk_removed = sync_relationships(
+            driver,
+            "MATCH (a:Stop)-[rel:WALKABLE_TO]->(b:Stop) RETURN a.id AS a, b.id AS b, rel.distance_meters AS dist",
+            walk_links, ["a", "b"],
+            """
+            UNWIND $batch AS row
+            MATCH (a:Stop {id: row.a})
+            MATCH (b:Stop {id: row.b})
+            MERGE (a)-[rel:WALKABLE_TO]->(b)
+            SET rel.distance_meters = row.dist
+            """,
+            """
+            UNWIND $batch AS row
+            MATCH (a:Stop {id: row.a})-[rel:WALKABLE_TO]->(b:Stop {id: row.b})
+            DELETE rel
+            """,
+            value_field="dist",
+            label="WALKABLE_TO",
+        )
 
+        print(f"... Stops +{len(changed_stops)}/-{len(removed_stops)}, Routes +{len(changed_routes)}/-{len(removed_routes)}, "
+              f"OPERATES_ON +{ops_added}/-{ops_removed}, WALKABLE_TO +{walk_added}/-{walk_removed}")
+        if changed_stops or removed_stops or changed_routes or removed_routes or ops_added or ops_removed or walk_added or walk_removed:
+            print(f"... Graph generation {bump_generation(driver)}")
         print(f"✅ Semantic Graph Built! ({len(stops_list)} Stops, {len(walk_links)} Walk Links)")
         return len(stops_list)
 
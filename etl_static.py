@@ -1,55 +1,255 @@
 import pandas as pd
+import numpy as np
 import os
-from collections import Counter
+import sys
+import glob
+import uuid
+import hashlib
+import pickle
 
 GTFS_PATH = "/app/import_stage"
+SNAPSHOT_PATH = os.path.join(GTFS_PATH, "static_lookups.pkl")
+SNAPSHOT_VERSION = 2
+SOURCE_FILES = ("routes.txt", "trips.txt")
 
-def load_static_lookups():
-    print("📂 Loading Static GTFS Data...")
-    
-    # 1. ROBUST MODE MAPPING
-    MODE_MAP = {
-        '0': 'TRAM', '900': 'TRAM', 
-        '1': 'METRO', '400': 'METRO', '401': 'METRO',
-        '2': 'TRAIN', '100': 'TRAIN', '109': 'TRAIN',
-        '4': 'FERRY', '1000': 'FERRY',
-        '3': 'BUS', '700': 'BUS', '701': 'BUS', '702': 'BUS', '704': 'BUS'
+# 1. ROBUST MODE MAPPING
+MODE_MAP = {
+    '0': 'TRAM', '900': 'TRAM',
+    '1': 'METRO', '400': 'METRO', '401': 'METRO',
+    '2': 'TRAIN', '100': 'TRAIN', '109': 'TRAIN',
+    '4': 'FERRY', '1000': 'FERRY',
+    '3': 'BUS', '700': 'BUS', '701': 'BUS', '702': 'BUS', '704': 'BUS'
+}
+
+class RouteInfo:
+    """Slotted route record; supports route['mode'] style access like the old per-route dicts."""
+    __slots__ = ("short", "long", "mode")
+
+    def __init__(self, short, long, mode):
+        self.short = short
+        self.long = long
+        self.mode = mode
+
+    def __getitem__(self, key):
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def __getstate__(self):
+        return (self.short, self.long, self.mode)
+
+    def __setstate__(self, state):
+        self.short, self.long, self.mode = state
+
+class TripHeadsignLookup:
+    """
+    Compact trip_id -> headsign map: a sorted fixed-width byte-string array of
+    trip ids (binary search) plus int32 codes into a list of distinct headsigns.
+    Answers .get() like the dict it replaces at a fraction of the memory, and the
+    arrays can be memory-mapped so worker processes share one copy.
+    """
+    def __init__(self, trip_ids, codes, headsigns):
+        self.trip_ids = trip_ids
+        self.codes = codes
+        self.headsigns = headsigns
+
+    @classmethod
+    def from_columns(cls, trip_ids, headsigns):
+        cat = pd.Categorical(headsigns)
+        ids = np.array([t.encode("utf-8") for t in trip_ids], dtype="S")
+        codes = cat.codes.astype(np.int32)
+        order = np.argsort(ids, kind="stable")
+        ids, codes = ids[order], codes[order]
+        # Duplicate trip ids: keep the last occurrence, as dict(zip(...)) would
+        if len(ids):
+            last = np.append(ids[1:] != ids[:-1], True)
+            ids, codes = ids[last], codes[last]
+        return cls(ids, codes, [sys.intern(str(h)) for h in cat.categories])
+
+    def __len__(self):
+        return len(self.trip_ids)
+
+    def __contains__(self, key):
+        return self._find(key) >= 0
+
+    def __getitem__(self, key):
+        i = self._find(key)
+        if i < 0:
+            raise KeyError(key)
+        return self.headsigns[self.codes[i]]
+
+    def get(self, key, default=None):
+        i = self._find(key)
+        return self.headsigns[self.codes[i]] if i >= 0 else default
+
+    def get_many(self, keys, default=None):
+        """Vectorized .get() over a sequence of trip ids; returns an object array."""
+        keys = np.asarray(keys, dtype=str)
+        if not len(keys) or not len(self.trip_ids):
+            return np.full(len(keys), default, dtype=object)
+        try:
+            k = keys.astype("S")
+        except UnicodeEncodeError:
+            k = np.array([x.encode("utf-8") for x in keys], dtype="S")
+        pos = np.minimum(np.searchsorted(self.trip_ids, k), len(self.trip_ids) - 1)
+        found = (self.trip_ids[pos] == k) & (keys != "")
+        out = np.full(len(keys), default, dtype=object)
+        out[found] = np.asarray(self.headsigns, dtype=object)[self.codes[pos[found]]]
+        return out
+
+    def _find(self, key):
+        if not key:
+            return -1
+        k = key.encode("utf-8") if isinstance(key, str) else key
+        i = int(np.searchsorted(self.trip_ids, k))
+        return i if i < len(self.trip_ids) and self.trip_ids[i] == k else -1
+
+    def save_arrays(self, prefix):
+        np.save(prefix + ".trip_ids.npy", self.trip_ids)
+        np.save(prefix + ".trip_codes.npy", self.codes)
+
+    @classmethod
+    def load_arrays(cls, prefix, headsigns):
+        return cls(np.load(prefix + ".trip_ids.npy", mmap_mode="r"),
+                   np.load(prefix + ".trip_codes.npy", mmap_mode="r"), headsigns)
+
+def _strip_prefix(col):
+    return col.str.replace("HSL:", "", regex=False).str.strip()
+
+def _file_sha1(path):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def _source_signature(gtfs_path):
+    """(size, mtime_ns) per source file; None if a file is missing."""
+    sig = {}
+    for name in SOURCE_FILES:
+        path = os.path.join(gtfs_path, name)
+        if not os.path.exists(path):
+            return None
+        st = os.stat(path)
+        sig[name] = (st.st_size, st.st_mtime_ns)
+    return sig
+
+def _load_snapshot(gtfs_path, snapshot_path, signature):
+    """
+    Returns the cached lookups if the sources are unchanged. A matching mtime is
+    trusted as-is; a changed mtime falls back to comparing content hashes, so a
+    re-copied but identical feed is still a hit. The trip arrays are memory-mapped.
+    """
+    try:
+        with open(snapshot_path, "rb") as f:
+            snap = pickle.load(f)
+        if snap.get("version") != SNAPSHOT_VERSION:
+            return None
+        prefix = _array_prefix(snapshot_path, snap["generation"])
+        trips = TripHeadsignLookup.load_arrays(prefix, snap["headsigns"])
+    except (OSError, pickle.UnpicklingError, EOFError, KeyError, ValueError):
+        return None
+    lookups = (snap["routes"], trips, snap["directions"])
+    if snap.get("signature") == signature:
+        return lookups
+    hashes = {name: _file_sha1(os.path.join(gtfs_path, name)) for name in SOURCE_FILES}
+    if snap.get("hashes") == hashes:
+        _write_snapshot(snapshot_path, lookups, signature, hashes)
+        return lookups
+    return None
+
+def _array_prefix(snapshot_path, generation):
+    return f"{os.path.splitext(snapshot_path)[0]}.{generation}"
+
+def _write_snapshot(snapshot_path, lookups, signature, hashes):
+    """
+    Small tables go into the pickle; trip arrays into generation-named .npy files
+    so a reader never mixes a new pickle with old arrays (or vice versa).
+    """
+    routes_dict, trip_lookup, direction_lookup = lookups
+    generation = uuid.uuid4().hex[:12]
+    prefix = _array_prefix(snapshot_path, generation)
+    tmp = snapshot_path + ".tmp"
+    try:
+        trip_lookup.save_arrays(prefix)
+        with open(tmp, "wb") as f:
+            pickle.dump({"version": SNAPSHOT_VERSION, "signature": signature, "hashes": hashes,
+                         "generation": generation, "routes": routes_dict, "directions": direction_lookup,
+                         "headsigns": trip_lookup.headsigns},
+                        f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, snapshot_path)
+    except OSError as e:
+        print(f"⚠️ Static snapshot not written: {e}")
+        return
+    # Drop array files of older generations (open memmaps keep their data until closed)
+    for path in glob.glob(_array_prefix(snapshot_path, "*") + ".trip_*.npy"):
+        if not path.startswith(prefix + "."):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+def build_route_lookup(routes):
+    r_ids = _strip_prefix(routes['route_id'])
+    r_types = routes['route_type'].fillna('3') if 'route_type' in routes else pd.Series('3', index=routes.index)
+    shorts = routes['route_short_name'].fillna(r_ids) if 'route_short_name' in routes else r_ids
+    longs = routes['route_long_name'].fillna('') if 'route_long_name' in routes else pd.Series('', index=routes.index)
+    modes = r_types.astype(str).map(MODE_MAP).fillna('BUS')
+    return {
+        r_id: RouteInfo(short, long_name, sys.intern(mode))
+        for r_id, short, long_name, mode in zip(r_ids, shorts, longs, modes)
     }
-    
+
+def build_trip_lookups(trips):
+    """trip_id -> headsign (TripHeadsignLookup), and (route_id, direction_id) -> most common headsign."""
+    df = pd.DataFrame({
+        "trip": _strip_prefix(trips['trip_id']),
+        "route": _strip_prefix(trips['route_id']),
+        "dir": trips['direction_id'].fillna('0') if 'direction_id' in trips else '0',
+        "headsign": trips['trip_headsign'].fillna('Unknown') if 'trip_headsign' in trips else 'Unknown',
+    })
+    trip_lookup = TripHeadsignLookup.from_columns(df['trip'], df['headsign'])
+
+    # Most common headsign per (route, direction); ties go to the first seen, like Counter.most_common
+    df['order'] = range(len(df))
+    counts = df.groupby(['route', 'dir', 'headsign'], sort=False).agg(n=('order', 'size'), first=('order', 'min')).reset_index()
+    best = counts.sort_values(['n', 'first'], ascending=[False, True]).drop_duplicates(['route', 'dir'])
+    direction_lookup = {
+        (sys.intern(r), sys.intern(d)): sys.intern(h) for r, d, h in zip(best['route'], best['dir'], best['headsign'])
+    }
+    return trip_lookup, direction_lookup
+
+def load_static_lookups(gtfs_path=GTFS_PATH, snapshot_path=None):
+    print("📂 Loading Static GTFS Data...")
+    snapshot_path = snapshot_path or os.path.join(gtfs_path, os.path.basename(SNAPSHOT_PATH))
+
+    signature = _source_signature(gtfs_path)
+    if signature:
+        cached = _load_snapshot(gtfs_path, snapshot_path, signature)
+        if cached is not None:
+            print("📂 Static GTFS lookups loaded from snapshot.")
+            return cached
+
     routes_dict = {}
     try:
-        routes = pd.read_csv(os.path.join(GTFS_PATH, "routes.txt"), dtype=str)
-        for _, row in routes.iterrows():
-            r_id = row['route_id'].replace("HSL:", "").strip()
-            r_type = str(row.get('route_type', '3'))
-            routes_dict[r_id] = {
-                "short": row.get('route_short_name', r_id),
-                "long": row.get('route_long_name', ''),
-                "mode": MODE_MAP.get(r_type, 'BUS')
-            }
-    except: pass
+        routes = pd.read_csv(os.path.join(gtfs_path, "routes.txt"), dtype=str)
+        routes_dict = build_route_lookup(routes)
+    except Exception as e:
+        print(f"⚠️ routes.txt not loaded: {e}")
 
     # 2. SMART DIRECTION LOOKUP
-    trip_lookup = {}
-    dir_counters = {}     
-    direction_lookup = {} 
-    
+    trip_lookup = TripHeadsignLookup.from_columns([], [])
+    direction_lookup = {}
     try:
-        trips = pd.read_csv(os.path.join(GTFS_PATH, "trips.txt"), dtype=str)
-        for _, row in trips.iterrows():
-            t_id = row['trip_id'].replace("HSL:", "").strip()
-            r_id = row['route_id'].replace("HSL:", "").strip()
-            d_id = str(row.get('direction_id', '0'))
-            headsign = row.get('trip_headsign', 'Unknown')
-            
-            trip_lookup[t_id] = headsign
-            
-            key = (r_id, d_id)
-            if key not in dir_counters: dir_counters[key] = Counter()
-            dir_counters[key][headsign] += 1
-            
-        for key, counter in dir_counters.items():
-            direction_lookup[key] = counter.most_common(1)[0][0]
-    except: pass
-
-    return routes_dict, trip_lookup, direction_lookup
\ No newline at end of file
+        trips = pd.read_csv(os.path.join(gtfs_path, "trips.txt"), dtype=str,
+                            usecols=lambda c: c in ('route_id', 'trip_id', 'direction_id', 'trip_headsign'))
+        trip_lookup, direction_lookup = build_trip_lookups(trips)
+    except Exception as e:
+        print(f"⚠️ trips.txt not loaded: {e}")
+
+    lookups = (routes_dict, trip_lookup, direction_lookup)
+    if signature and routes_dict and len(trip_lookup):
+        hashes = {name: _file_sha1(os.path.join(gtfs_path, name)) for name in SOURCE_FILES}
+        _write_snapshot(snapshot_path, lookups, signature, hashes)
+    return lookups
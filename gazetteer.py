@@ -0,0 +1,197 @@
+import os
+import re
+import json
+import bisect
+import threading
+import unicodedata
+import requests
+
+from ttl_cache import TTLCache
+
+GEOCODER_URL = "https://api.digitransit.fi/geocoding/v1/search"
+GEOCODER_MIN_CHARS = int(os.getenv("GEOCODER_MIN_CHARS", "3"))
+GEOCODER_CACHE_SIZE = int(os.getenv("GEOCODER_CACHE_SIZE", "2048"))
+GEOCODER_CACHE_TTL = float(os.getenv("GEOCODER_CACHE_TTL", "86400"))
+GEOCODER_TIMEOUT = float(os.getenv("GEOCODER_TIMEOUT", "3"))
+# Browser-side debounce of the search boxes, milliseconds
+SEARCH_DEBOUNCE_MS = int(os.getenv("SEARCH_DEBOUNCE_MS", "250"))
+# Token prefix length covered by the one-typo index
+FUZZY_PREFIX = 6
+# Candidates ranked per query at most (bounds one- and two-letter prefixes)
+MAX_CANDIDATES = 500
+
+KIND_RANK = {"stop": 0, "poi": 1, "geocoder": 2}
+
+
+def fold(text):
+    """Search key: lowercase, accents dropped (Töölö -> toolo), punctuation to spaces."""
+    text = unicodedata.normalize("NFKD", str(text).casefold())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(re.sub(r"[^\w\s]", " ", text).split())
+
+
+def _deletes(token):
+    """The token prefix and all its single-character deletions (SymSpell-style typo keys)."""
+    token = token[:FUZZY_PREFIX]
+    return {token} | {token[:i] + token[i + 1:] for i in range(len(token))}
+
+
+def as_option(entry):
+    """(label, payload) pair in the shape st_searchbox expects."""
+    return (entry["name"], json.dumps({"name": entry["name"], "lat": entry["lat"], "lon": entry["lon"]}))
+
+
+class Gazetteer:
+    """
+    In-memory place-name index for autocomplete.
+    Two sorted key lists answer prefix queries with a binary search: full
+    folded names ("kamppi metro") and every word of every name ("metro"),
+    so both "kamp" and "metro" reach "Kamppi (M)". A deletion index over
+    word prefixes adds one-typo matches ("kampi", "toolo"). Entries are
+    dicts with name/lat/lon/kind; names are unique after folding.
+    """
+    def __init__(self, entries=()):
+        self.entries = []
+        self._by_key = {}
+        self._words_of = []
+        self._names = []
+        self._words = []
+        self._typos = {}
+        self._lock = threading.Lock()
+        for entry in entries:
+            self._add(entry, sort=False)
+        self._names.sort()
+        self._words.sort()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, entry):
+        with self._lock:
+            self._add(entry, sort=True)
+
+    def _add(self, entry, sort):
+        key = fold(entry["name"])
+        if not key or key in self._by_key:
+            return
+        i = len(self.entries)
+        self.entries.append(entry)
+        self._words_of.append(key.split())
+        self._by_key[key] = i
+        insert = bisect.insort if sort else list.append
+        insert(self._names, (key, i))
+        for word in set(key.split()):
+            insert(self._words, (word, i))
+            for variant in _deletes(word):
+                self._typos.setdefault(variant, set()).add(i)
+
+    @staticmethod
+    def _prefix_ids(keys, prefix):
+        lo = bisect.bisect_left(keys, (prefix,))
+        hi = min(bisect.bisect_left(keys, (prefix + "\uffff",)), lo + MAX_CANDIDATES)
+        return [i for _, i in keys[lo:hi]]
+
+    def _words_match(self, i, tokens):
+        words = self._words_of[i]
+        return all(any(w.startswith(t) for w in words) for t in tokens)
+
+    def search(self, query, limit=5):
+        q = fold(query)
+        if not q:
+            return []
+        tokens = q.split()
+        ranked = {}
+
+        def offer(ids, rank):
+            for i in ids:
+                if i not in ranked:
+                    ranked[i] = rank
+
+        # 0: the whole name starts with the query; 1: every query word starts some word of the name
+        offer(self._prefix_ids(self._names, q), 0)
+        longest = max(tokens, key=len)
+        offer((i for i in self._prefix_ids(self._words, longest) if self._words_match(i, tokens)), 1)
+        # 2: one typo in the first letters of the longest word
+        if len(ranked) < limit and len(longest) >= 3:
+            typo_ids = set()
+            for variant in _deletes(longest):
+                typo_ids |= self._typos.get(variant, set())
+            offer(typo_ids, 2)
+
+        best = sorted(ranked, key=lambda i: (ranked[i], KIND_RANK.get(self.entries[i].get("kind"), 9),
+                                             len(self.entries[i]["name"]), self.entries[i]["name"]))
+        return [self.entries[i] for i in best[:limit]]
+
+
+class RemoteGeocoder:
+    """
+    Cached fallback to the Digitransit geocoder over one pooled HTTP session.
+    Results are cached by folded query (LRU + TTL); queries shorter than
+    `min_chars` never leave the process.
+    """
+    def __init__(self, api_key, url=GEOCODER_URL, size=5, cache_size=GEOCODER_CACHE_SIZE,
+                 cache_ttl=GEOCODER_CACHE_TTL, min_chars=GEOCODER_MIN_CHARS, timeout=GEOCODER_TIMEOUT):
+        self.url = url
+        self.size = size
+        self.min_chars = min_chars
+        self.timeout = timeout
+        self.http = requests.Session()
+        self.http.params = {"digitransit-subscription-key": api_key}
+        self.cache = TTLCache(maxsize=cache_size, ttl_seconds=cache_ttl)
+        self.requests_made = 0
+
+    def search(self, query):
+        q = fold(query)
+        if len(q) < self.min_chars:
+            return []
+        cached = self.cache.get(q)
+        if cached is not None:
+            return cached
+        try:
+            resp = self.http.get(self.url, params={"text": query, "size": self.size}, timeout=self.timeout)
+            self.requests_made += 1
+            resp.raise_for_status()
+            features = resp.json().get("features", [])
+        except (requests.RequestException, ValueError) as e:
+            print(f"⚠️ Geocoder request failed: {e}")
+            return []
+        results = [
+            {"name": f["properties"]["label"], "lat": f["geometry"]["coordinates"][1],
+             "lon": f["geometry"]["coordinates"][0], "kind": "geocoder"}
+            for f in features
+        ]
+        self.cache.put(q, results)
+        return results
+
+
+class PlaceSearch:
+    """
+    Autocomplete for the start/destination boxes: the graph gazetteer first,
+    then places the geocoder returned earlier, and the remote geocoder only
+    when those cannot fill the list. Remote answers are remembered locally.
+    """
+    def __init__(self, remote, size=5):
+        self.remote = remote
+        self.size = size
+        self.learned = Gazetteer()
+
+    def search(self, query, local=None):
+        results = []
+        seen = set()
+
+        def take(entries):
+            for e in entries:
+                key = fold(e["name"])
+                if key not in seen and len(results) < self.size:
+                    seen.add(key)
+                    results.append(e)
+
+        if local is not None:
+            take(local.search(query, self.size))
+        take(self.learned.search(query, self.size))
+        if len(results) < self.size:
+            remote = self.remote.search(query)
+            for e in remote:
+                self.learned.add(e)
+            take(remote)
+        return results
@@ -0,0 +1,198 @@
+import os
+import time
+import numpy as np
+import pandas as pd
+
+from graph_sync import read_generation, report_throughput
+from spatial_index import GridIndex
+
+# Stops around a place whose neighbourhood is described to the LLM
+CONTEXT_RADIUS_M = float(os.getenv("GRAPH_CONTEXT_RADIUS_M", "400"))
+CONTEXT_MAX_STOPS = int(os.getenv("GRAPH_CONTEXT_MAX_STOPS", "4"))
+CONTEXT_MAX_PLACES = int(os.getenv("GRAPH_CONTEXT_MAX_PLACES", "6"))
+
+QUERIES = {
+    "stops": "MATCH (s:Stop) WHERE s.lat IS NOT NULL RETURN s.id, coalesce(s.name, ''), s.lat, s.lon, coalesce(s.semantic_tags, [])",
+    "routes": "MATCH (r:Route) RETURN r.id, coalesce(r.name, ''), coalesce(r.mode, '')",
+    "pois": "MATCH (p:PointOfInterest) WHERE p.lat IS NOT NULL RETURN p.id, coalesce(p.name, ''), p.lat, p.lon, p.description",
+    "operates_on": "MATCH (r:Route)-[:OPERATES_ON]->(s:Stop) RETURN r.id, s.id",
+    "is_near": "MATCH (s:Stop)-[rel:IS_NEAR]->(p:PointOfInterest) RETURN s.id, p.id, rel.distance_meters",
+    "walkable_to": "MATCH (a:Stop)-[rel:WALKABLE_TO]->(b:Stop) RETURN a.id, b.id, rel.distance_meters",
+}
+
+
+def csr_gather(indptr, rows):
+    """Flat positions of the CSR ranges indptr[r]:indptr[r + 1] for every r in `rows`."""
+    rows = np.asarray(rows, dtype=np.int64)
+    counts = indptr[rows + 1] - indptr[rows]
+    first = np.repeat(indptr[rows] - np.cumsum(counts) + counts, counts)
+    return first + np.arange(int(counts.sum()))
+
+
+class IdMap:
+    """Graph ids <-> dense row numbers, as a sorted id array searched with NumPy."""
+    def __init__(self, ids):
+        self.ids = np.asarray(ids, dtype=str)
+        self._order = np.argsort(self.ids, kind="stable")
+        self._sorted = self.ids[self._order]
+
+    def __len__(self):
+        return len(self.ids)
+
+    def rows(self, ids):
+        """Row per id, -1 where the id is unknown."""
+        ids = np.asarray(ids, dtype=str).ravel()
+        if not len(self._sorted):
+            return np.full(len(ids), -1, dtype=np.int64)
+        pos = np.minimum(np.searchsorted(self._sorted, ids), len(self._sorted) - 1)
+        return np.where(self._sorted[pos] == ids, self._order[pos], -1)
+
+
+class Adjacency:
+    """One edge type in CSR form: neighbours of row r are indices[indptr[r]:indptr[r + 1]], nearest first."""
+    def __init__(self, src, dst, n_rows, weights=None):
+        src, dst = np.asarray(src, dtype=np.int64), np.asarray(dst, dtype=np.int64)
+        weights = np.zeros(len(src)) if weights is None else np.asarray(weights, dtype=float)
+        order = np.lexsort((weights, src))
+        self.indices = dst[order]
+        self.weights = weights[order]
+        self.indptr = np.searchsorted(src[order], np.arange(n_rows + 1))
+
+    def __len__(self):
+        return len(self.indices)
+
+    def degree(self, rows):
+        rows = np.asarray(rows, dtype=np.int64)
+        return self.indptr[rows + 1] - self.indptr[rows]
+
+    def expand(self, rows):
+        """(source row, neighbour, weight) for every edge leaving `rows`."""
+        rows = np.asarray(rows, dtype=np.int64)
+        slots = csr_gather(self.indptr, rows)
+        return np.repeat(rows, self.degree(rows)), self.indices[slots], self.weights[slots]
+
+
+class GraphSnapshot:
+    """
+    Read-only in-process copy of the Stop/Route/POI topology.
+    Node properties are column arrays addressed by dense rows (IdMap per label);
+    OPERATES_ON, IS_NEAR and WALKABLE_TO are held as CSR adjacency in both
+    directions, so neighbourhood expansion (stop -> nearby places -> serving
+    routes) is a few array gathers instead of Neo4j round trips. Built from one
+    graph generation; GraphReadModel swaps in a new one when the ETL bumps it.
+    """
+    def __init__(self, stops, routes, pois, operates_on, is_near, walkable_to, generation=None):
+        self.generation = generation
+        self.stop_ids = IdMap(stops[0])
+        self.stop_names = np.asarray(stops[1], dtype=str)
+        self.stop_lat, self.stop_lon = np.asarray(stops[2], dtype=float), np.asarray(stops[3], dtype=float)
+        self.stop_tags = np.asarray([", ".join(tags or []) for tags in stops[4]], dtype=str)
+        self.route_ids = IdMap(routes[0])
+        self.route_names = np.asarray(routes[1], dtype=str)
+        self.route_modes = np.asarray(routes[2], dtype=str)
+        self.poi_ids = IdMap(pois[0])
+        self.poi_names = np.asarray(pois[1], dtype=str)
+        self.poi_lat, self.poi_lon = np.asarray(pois[2], dtype=float), np.asarray(pois[3], dtype=float)
+        self.poi_desc = list(pois[4])
+        n_stops, n_routes, n_pois = len(self.stop_ids), len(self.route_ids), len(self.poi_ids)
+
+        r, s = self._rows(self.route_ids, operates_on[0], self.stop_ids, operates_on[1])
+        self.route_stops = Adjacency(r, s, n_routes)
+        self.stop_routes = Adjacency(s, r, n_stops)
+
+        s, p, keep = self._rows(self.stop_ids, is_near[0], self.poi_ids, is_near[1], with_mask=True)
+        dist = np.asarray(is_near[2], dtype=float)[keep]
+        self.stop_pois = Adjacency(s, p, n_stops, dist)
+        self.poi_stops = Adjacency(p, s, n_pois, dist)
+
+        # WALKABLE_TO is stored once per pair; walking works both ways
+        a, b, keep = self._rows(self.stop_ids, walkable_to[0], self.stop_ids, walkable_to[1], with_mask=True)
+        dist = np.asarray(walkable_to[2], dtype=float)[keep]
+        self.stop_walk = Adjacency(np.concatenate((a, b)), np.concatenate((b, a)), n_stops, np.concatenate((dist, dist)))
+
+        self.stop_grid = GridIndex(self.stop_lat, self.stop_lon, cell_meters=CONTEXT_RADIUS_M)
+
+    @staticmethod
+    def _rows(left_map, left_ids, right_map, right_ids, with_mask=False):
+        left, right = left_map.rows(left_ids), right_map.rows(right_ids)
+        keep = (left >= 0) & (right >= 0)
+        return (left[keep], right[keep], keep) if with_mask else (left[keep], right[keep])
+
+    @classmethod
+    def from_driver(cls, driver):
+        """One read per node label / edge type; records come back as plain value lists."""
+        started = time.perf_counter()
+        generation = read_generation(driver)
+        columns = {}
+        with driver.session() as session:
+            for name, query in QUERIES.items():
+                result = session.run(query)
+                width = len(result.keys())
+                rows = result.values()
+                columns[name] = list(zip(*rows)) if rows else [()] * width
+        snapshot = cls(generation=generation, **columns)
+        report_throughput("Graph snapshot", len(snapshot.stop_ids) + len(snapshot.poi_ids) + len(snapshot.stop_routes)
+                          + len(snapshot.stop_pois) + len(snapshot.stop_walk) // 2, started)
+        return snapshot
+
+    # --- Views ---
+
+    def pois_frame(self):
+        return pd.DataFrame({"name": self.poi_names, "lat": self.poi_lat, "lon": self.poi_lon, "desc": self.poi_desc})
+
+    def poi_records(self):
+        return [{"name": n, "description": d, "lat": la, "lon": lo} for n, d, la, lo in
+                zip(self.poi_names.tolist(), self.poi_desc, self.poi_lat.tolist(), self.poi_lon.tolist())]
+
+    def place_entries(self):
+        """Named stops and POIs for the autocomplete gazetteer."""
+        stops = [{"name": n, "lat": la, "lon": lo, "kind": "stop"} for n, la, lo in
+                 zip(self.stop_names.tolist(), self.stop_lat.tolist(), self.stop_lon.tolist()) if n]
+        pois = [{"name": n, "lat": la, "lon": lo, "kind": "poi"} for n, la, lo in
+                zip(self.poi_names.tolist(), self.poi_lat.tolist(), self.poi_lon.tolist()) if n]
+        return stops + pois
+
+    def walk_links(self):
+        """(stop id, stop id, metres) once per WALKABLE_TO pair."""
+        frm, to, dist = self.stop_walk.expand(np.arange(len(self.stop_ids)))
+        once = frm < to
+        frm, to, dist = frm[once], to[once], dist[once]
+        ids = self.stop_ids.ids
+        return list(zip(ids[frm].tolist(), ids[to].tolist(), dist.tolist()))
+
+    # --- Neighbourhood expansion ---
+
+    def neighbourhood(self, lat, lon, radius=CONTEXT_RADIUS_M, max_stops=CONTEXT_MAX_STOPS):
+        """
+        Stops within `radius` (nearest `max_stops`), the stops one WALKABLE_TO
+        hop away, the places IS_NEAR any of them and the routes serving them.
+        """
+        idx, dist = self.stop_grid.query_radius(lat, lon, radius)
+        near = idx[np.argsort(dist, kind="stable")[:max_stops]]
+        _, walk, _ = self.stop_walk.expand(near)
+        stops = np.unique(np.concatenate((near, walk)))
+        at_stop, pois, poi_dist = self.stop_pois.expand(stops)
+        served, routes, _ = self.stop_routes.expand(near)
+        return {"stops": near, "walk_stops": np.setdiff1d(stops, near), "pois": pois, "poi_stops": at_stop,
+                "poi_dist": poi_dist, "routes": routes, "route_stops": served}
+
+    def context(self, lat, lon, label="the destination", radius=CONTEXT_RADIUS_M, max_places=CONTEXT_MAX_PLACES):
+        """Plain-text neighbourhood summary for an LLM prompt; empty if nothing is nearby."""
+        hood = self.neighbourhood(lat, lon, radius)
+        if not len(hood["stops"]):
+            return ""
+        lines = [f"Around {label}:"]
+        for s in hood["stops"].tolist():
+            lines_at = hood["routes"][hood["route_stops"] == s]
+            names = sorted(set(self.route_names[lines_at].tolist()), key=lambda n: (len(n), n))
+            tags = f" [{self.stop_tags[s]}]" if self.stop_tags[s] else ""
+            lines.append(f" - Stop {self.stop_names[s]}: lines {', '.join(names) or 'n/a'}{tags}")
+        if len(hood["pois"]):
+            # Each place once, by its closest stop
+            order = np.argsort(hood["poi_dist"], kind="stable")
+            _, first = np.unique(hood["pois"][order], return_index=True)
+            picked = order[np.sort(first)][:max_places]
+            for i in picked.tolist():
+                p, s = int(hood["pois"][i]), int(hood["poi_stops"][i])
+                lines.append(f" - {self.poi_names[p]} ({hood['poi_dist'][i]:.0f} m from {self.stop_names[s]})")
+        return "\n".join(lines)
@@ -0,0 +1,44 @@
+import math
+from collections import Counter, defaultdict
+import numpy as np
+
+
+class BM25Index:
+    """
+    Inverted index over pre-tokenized documents (TextNormalizer stems) with
+    Okapi BM25 scoring. Per-posting weights are precomputed at build time,
+    so a query is just a sum over the postings of its terms.
+    """
+    def __init__(self, docs_tokens, k1=1.5, b=0.75):
+        self.n_docs = len(docs_tokens)
+        doc_len = np.array([len(t) for t in docs_tokens], dtype=np.float32)
+        avgdl = float(doc_len.mean()) if self.n_docs and doc_len.mean() > 0 else 1.0
+
+        postings = defaultdict(list)
+        for doc_id, tokens in enumerate(docs_tokens):
+            for term, tf in Counter(tokens).items():
+                postings[term].append((doc_id, tf))
+
+        self.postings = {}
+        for term, plist in postings.items():
+            ids = np.array([p[0] for p in plist], dtype=np.int64)
+            tf = np.array([p[1] for p in plist], dtype=np.float32)
+            df = len(ids)
+            idf = math.log(1 + (self.n_docs - df + 0.5) / (df + 0.5))
+            norm = k1 * (1 - b + b * doc_len[ids] / avgdl)
+            self.postings[term] = (ids, (idf * tf * (k1 + 1) / (tf + norm)).astype(np.float32))
+
+    def __len__(self):
+        return self.n_docs
+
+    def search(self, query_tokens):
+        """Returns (doc_ids, scores) for every document sharing at least one term with the query."""
+        hits = [self.postings[t] for t in set(query_tokens) if t in self.postings]
+        if not hits:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        ids = np.concatenate([h[0] for h in hits])
+        weights = np.concatenate([h[1] for h in hits])
+        doc_ids, inverse = np.unique(ids, return_inverse=True)
+        scores = np.zeros(len(doc_ids), dtype=np.float32)
+        np.add.at(scores, inverse, weights)
+        return doc_ids, scores
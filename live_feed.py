@@ -0,0 +1,184 @@
+import time
+import threading
+from collections import namedtuple
+import requests
+import numpy as np
+import pandas as pd
+
+VEHICLE_FEED_URL = "https://realtime.hsl.fi/realtime/vehicle-positions/v2/hsl"
+
+# Immutable view of one processed feed; sessions read it, never modify it
+FeedSnapshot = namedtuple("FeedSnapshot", ["vehicles", "feed_timestamp", "fetched_at"])
+EMPTY_SNAPSHOT = FeedSnapshot(pd.DataFrame(), 0, 0.0)
+
+
+# Map styling per mode: (fill colour, radius); anything else is drawn as a bus
+MODE_STYLES = {
+    'TRAM': ([0, 200, 100, 200], 40),
+    'METRO': ([255, 140, 0, 200], 50),
+    'TRAIN': ([200, 0, 0, 200], 50),
+    'FERRY': ([0, 100, 255, 200], 60),
+}
+DEFAULT_STYLE = ([0, 150, 255, 180], 30)
+STYLE_MODES = list(MODE_STYLES)
+STYLE_INDEX = {m: i for i, m in enumerate(STYLE_MODES)}
+STYLE_COLORS = [MODE_STYLES[m][0] for m in STYLE_MODES] + [DEFAULT_STYLE[0]]
+STYLE_RADII = np.array([MODE_STYLES[m][1] for m in STYLE_MODES] + [DEFAULT_STYLE[1]])
+
+_tables = {}
+
+
+def _lookup_tables(routes_dict, direction_lookup):
+    """Route short/mode and direction headsign maps as flat dicts, rebuilt only when the lookups change."""
+    key = (id(routes_dict), id(direction_lookup))
+    if key not in _tables:
+        _tables.clear()
+        _tables[key] = (
+            {r: info['short'] for r, info in routes_dict.items()},
+            {r: info['mode'] for r, info in routes_dict.items()},
+            {f"{r}\x1f{d}": h for (r, d), h in direction_lookup.items()},
+        )
+    return _tables[key]
+
+
+def _strip(raw_id):
+    return raw_id.replace("HSL:", "").strip()
+
+
+def feed_columns(feed):
+    """One pass over the protobuf entities, extracting only the fields the map needs."""
+    vs = [e.vehicle for e in feed.entity if e.HasField('vehicle')]
+    return {
+        "route": [v.trip.route_id for v in vs],
+        "trip": [_strip(v.trip.trip_id) for v in vs],
+        "dir": np.array([v.trip.direction_id for v in vs], dtype=np.int64),
+        "lat": np.array([v.position.latitude for v in vs]),
+        "lon": np.array([v.position.longitude for v in vs]),
+    }
+
+
+def vehicles_from_feed(feed, routes_dict, trip_lookup, direction_lookup):
+    """
+    Turns a parsed GTFS-RT FeedMessage into the vehicle DataFrame drawn on the map.
+    Columnar: ids and coordinates are extracted once; route attributes are
+    resolved per distinct route (a few hundred) and gathered by code, headsigns
+    come from one vectorized trip lookup, and tooltips are formatted per
+    distinct (route, headsign) pair.
+    """
+    cols = feed_columns(feed)
+    if not len(cols["lat"]):
+        return pd.DataFrame()
+    short_map, mode_map, dir_map = _lookup_tables(routes_dict, direction_lookup)
+
+    # Routes: factorize the raw ids, resolve each distinct route once
+    route_codes, raw_routes = pd.factorize(pd.Series(cols["route"], dtype=object), sort=False)
+    routes = [_strip(r) for r in raw_routes]
+    route_modes = [mode_map.get(r, 'BUS') for r in routes]
+    route_shorts = [short_map.get(r, r) for r in routes]
+    route_styles = np.array([STYLE_INDEX.get(m, len(STYLE_MODES)) for m in route_modes], dtype=np.int64)
+    style = route_styles[route_codes]
+
+    # Headsign: exact trip, else the route/direction's usual headsign, else a generic label
+    if hasattr(trip_lookup, "get_many"):
+        headsign = trip_lookup.get_many(cols["trip"])
+    else:
+        headsign = np.array([trip_lookup.get(t) for t in cols["trip"]], dtype=object)
+    missing = np.flatnonzero(pd.isna(headsign) | (headsign == ""))
+    for i in missing:
+        r, d = routes[route_codes[i]], str(cols["dir"][i])
+        headsign[i] = dir_map.get(f"{r}\x1f{d}") or ("City Centre" if d == '1' else "Regional Terminus")
+
+    # Tooltips: many vehicles share a route and destination, so format each pair once
+    hs_codes, hs_uniques = pd.factorize(headsign, sort=False)
+    pair_codes, pairs = pd.factorize(route_codes.astype(np.int64) * len(hs_uniques) + hs_codes, sort=False)
+    labels = np.array([
+        f"<b>{route_modes[p // len(hs_uniques)]} {route_shorts[p // len(hs_uniques)]}</b><br/>To: {hs_uniques[p % len(hs_uniques)]}"
+        for p in pairs
+    ], dtype=object)
+
+    return pd.DataFrame({
+        "lat": cols["lat"],
+        "lon": cols["lon"],
+        "color": [STYLE_COLORS[i] for i in style],
+        "radius": STYLE_RADII[style],
+        "html_tooltip": labels[pair_codes],
+    })
+
+
+class VehicleFeedPoller:
+    """
+    One process-wide poller of the HSL vehicle-position feed.
+    A daemon thread downloads the feed with conditional GETs over a pooled
+    connection, skips snapshots whose feed.header.timestamp has not moved,
+    and publishes an immutable FeedSnapshot. Every browser session reads the
+    latest snapshot, so upstream load and parse cost do not grow with users.
+    """
+    def __init__(self, api_key, lookups_fn, url=VEHICLE_FEED_URL, interval=2.0, timeout=2.0):
+        self.url = url
+        self.interval = interval
+        self.timeout = timeout
+        self.lookups_fn = lookups_fn
+        self.http = requests.Session()
+        self.http.headers.update({"digitransit-subscription-key": api_key or ""})
+        self._snapshot = EMPTY_SNAPSHOT
+        self._etag = None
+        self._last_modified = None
+        self._last_key = None
+        self._thread = None
+        self._stop = threading.Event()
+        self.stats = {"fetches": 0, "not_modified": 0, "unchanged": 0, "published": 0, "errors": 0}
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="gtfs-rt-poller", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def snapshot(self):
+        return self._snapshot
+
+    def _run(self):
+        while not self._stop.is_set():
+            started = time.monotonic()
+            try:
+                self.poll_once()
+            except Exception as e:
+                self.stats["errors"] += 1
+                print(f"⚠️ Vehicle feed poll failed: {e}")
+            self._stop.wait(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def poll_once(self):
+        """Fetches and, if anything changed, publishes a new snapshot. Returns True when published."""
+        from google.transit import gtfs_realtime_pb2
+
+        headers = {}
+        if self._etag: headers["If-None-Match"] = self._etag
+        if self._last_modified: headers["If-Modified-Since"] = self._last_modified
+        resp = self.http.get(self.url, headers=headers, timeout=self.timeout)
+        self.stats["fetches"] += 1
+        if resp.status_code == 304:
+            self.stats["not_modified"] += 1
+            return False
+        resp.raise_for_status()
+        self._etag = resp.headers.get("ETag")
+        self._last_modified = resp.headers.get("Last-Modified")
+
+        feed = gtfs_realtime_pb2.FeedMessage()
+        feed.ParseFromString(resp.content)
+
+        # Rebuild only when the feed moved on, or the static lookups finished loading since last time
+        lookups = self.lookups_fn()
+        key = (feed.header.timestamp, id(lookups))
+        if key == self._last_key:
+            self.stats["unchanged"] += 1
+            return False
+
+        vehicles = vehicles_from_feed(feed, *lookups)
+        self._snapshot = FeedSnapshot(vehicles, feed.header.timestamp, time.time())
+        self._last_key = key
+        self.stats["published"] += 1
+        return True
@@ -0,0 +1,112 @@
+import os
+import math
+import numpy as np
+import pandas as pd
+
+# Assumed on-screen map size; the viewport bbox is derived from centre + zoom + this
+VIEW_WIDTH_PX = int(os.getenv("MAP_VIEW_WIDTH_PX", "1400"))
+VIEW_HEIGHT_PX = int(os.getenv("MAP_VIEW_HEIGHT_PX", "800"))
+# Extra fraction of the view kept on every side, so small pans do not reveal empty map
+VIEW_MARGIN = float(os.getenv("MAP_VIEW_MARGIN", "0.5"))
+# At or below this zoom points are aggregated into grid cells of CLUSTER_CELL_PX pixels
+CLUSTER_MAX_ZOOM = float(os.getenv("MAP_CLUSTER_MAX_ZOOM", "12"))
+CLUSTER_CELL_PX = int(os.getenv("MAP_CLUSTER_CELL_PX", "60"))
+
+DEFAULT_VIEW = {"lat": 60.17, "lon": 24.94, "zoom": 13}
+MIN_ZOOM, MAX_ZOOM = 8, 17
+WEB_MERCATOR_M_PER_PX = 156543.03392
+
+
+def meters_per_pixel(lat, zoom):
+    return WEB_MERCATOR_M_PER_PX * math.cos(math.radians(lat)) / (2 ** zoom)
+
+
+def viewport_bbox(view, width_px=VIEW_WIDTH_PX, height_px=VIEW_HEIGHT_PX, margin=VIEW_MARGIN):
+    """(min_lat, min_lon, max_lat, max_lon) visible at the view's centre/zoom, grown by `margin`."""
+    mpp = meters_per_pixel(view["lat"], view["zoom"])
+    half_h = height_px * mpp * (0.5 + margin) / 111320.0
+    half_w = width_px * mpp * (0.5 + margin) / (111320.0 * math.cos(math.radians(view["lat"])))
+    return (view["lat"] - half_h, view["lon"] - half_w, view["lat"] + half_h, view["lon"] + half_w)
+
+
+def fit_view(points, width_px=VIEW_WIDTH_PX, height_px=VIEW_HEIGHT_PX, padding=0.15):
+    """Centre and the largest whole zoom at which all (lat, lon) points fit on screen."""
+    lats = np.array([p[0] for p in points], dtype=float)
+    lons = np.array([p[1] for p in points], dtype=float)
+    lat, lon = float(lats.mean()), float(lons.mean())
+    span_m_y = max((lats.max() - lats.min()) * 111320.0, 1.0)
+    span_m_x = max((lons.max() - lons.min()) * 111320.0 * math.cos(math.radians(lat)), 1.0)
+    usable = 1 - 2 * padding
+    zoom = MAX_ZOOM
+    while zoom > MIN_ZOOM:
+        mpp = meters_per_pixel(lat, zoom)
+        if span_m_x <= width_px * usable * mpp and span_m_y <= height_px * usable * mpp:
+            break
+        zoom -= 1
+    return {"lat": lat, "lon": lon, "zoom": zoom}
+
+
+def view_key(view):
+    """Hashable, slightly quantized view identity for caching per-view layers."""
+    return (round(view["lat"], 3), round(view["lon"], 3), view["zoom"])
+
+
+def cull(df, bbox):
+    if df.empty:
+        return df
+    min_lat, min_lon, max_lat, max_lon = bbox
+    lat, lon = df['lat'].to_numpy(dtype=float), df['lon'].to_numpy(dtype=float)
+    inside = (lat >= min_lat) & (lat <= max_lat) & (lon >= min_lon) & (lon <= max_lon)
+    return df if inside.all() else df[inside]
+
+
+def cluster(df, view, noun, cell_px=CLUSTER_CELL_PX):
+    """
+    Aggregates points into square grid cells of `cell_px` screen pixels.
+    Single-point cells keep their original row; larger cells become one marker
+    at the members' centroid, coloured like their first member, sized by count.
+    """
+    if len(df) < 2:
+        return df
+    cell_m = cell_px * meters_per_pixel(view["lat"], view["zoom"])
+    lat, lon = df['lat'].to_numpy(dtype=float), df['lon'].to_numpy(dtype=float)
+    rows = np.floor(lat * 111320.0 / cell_m).astype(np.int64)
+    cols = np.floor(lon * 111320.0 * math.cos(math.radians(view["lat"])) / cell_m).astype(np.int64)
+    codes, _ = pd.factorize(rows * 1_000_003 + cols, sort=False)
+    counts = np.bincount(codes)
+    if counts.max() == 1:
+        return df
+
+    member_count = counts[codes]
+    singles = df[member_count == 1]
+    grouped = np.flatnonzero(counts > 1)
+    in_group = member_count > 1
+    g_codes = codes[in_group]
+    n = counts[grouped]
+    _, first = np.unique(codes, return_index=True)
+
+    colors = df['color'].to_numpy() if 'color' in df.columns else np.full(len(df), None, dtype=object)
+    clusters = pd.DataFrame({
+        "lat": np.bincount(g_codes, weights=lat[in_group], minlength=len(counts))[grouped] / n,
+        "lon": np.bincount(g_codes, weights=lon[in_group], minlength=len(counts))[grouped] / n,
+        "color": list(colors[first[grouped]]),
+        "radius": cell_m * np.minimum(0.5, 0.12 * (1 + np.log2(n))),
+        "html_tooltip": [f"<b>{c} {noun}</b><br/>Zoom in for details" for c in n],
+        "count": n,
+    })
+    return pd.concat([singles, clusters], ignore_index=True)
+
+
+def prepare_points(df, view, noun):
+    """
+    The subset of `df` worth sending to the browser for this view: clustered
+    when zoomed out, and culled to the bbox only for a view the browser
+    reported ("reported": True). A server-side guess (slider, fit_view) is not
+    where the user has panned to, so every point is kept then.
+    """
+    if df is None or df.empty:
+        return df
+    visible = cull(df, viewport_bbox(view)) if view.get("reported") else df
+    if view["zoom"] <= CLUSTER_MAX_ZOOM:
+        visible = cluster(visible, view, noun)
+    return visible
@@ -0,0 +1,117 @@
+import os
+import time
+import threading
+from concurrent.futures import Future
+import requests
+
+from ttl_cache import TTLCache
+
+PLANNER_URL = "https://api.digitransit.fi/routing/v1/routers/hsl/index/graphql"
+PLAN_CACHE_SIZE = int(os.getenv("PLAN_CACHE_SIZE", "512"))
+PLAN_CACHE_TTL = float(os.getenv("PLAN_CACHE_TTL", "300"))
+# 3 decimals is ~110 m north-south / ~55 m east-west in Helsinki
+PLAN_COORD_DECIMALS = int(os.getenv("PLAN_COORD_DECIMALS", "3"))
+PLAN_TIME_BUCKET_SECONDS = int(os.getenv("PLAN_TIME_BUCKET_SECONDS", "300"))
+PLAN_ITINERARIES = 2
+# In-process GTFS planner: "fallback" when Digitransit fails, "prefer" to try it first, "off"
+OFFLINE_PLANNER = os.getenv("OFFLINE_PLANNER", "fallback")
+
+# Geometry for the map and schedule legs for the LLM, in one request
+PLAN_QUERY = """
+{ plan(from: {lat: %f, lon: %f}, to: {lat: %f, lon: %f}, numItineraries: %d, %s) {
+    itineraries {
+        duration
+        legs { mode startTime route { shortName } from { name } to { name } legGeometry { points } }
+    }
+} }
+"""
+
+
+class TripPlanner:
+    """
+    Digitransit plan() client shared by the map route and the itinerary text.
+    Answers are cached by origin/destination rounded to PLAN_COORD_DECIMALS and
+    departure time bucketed to PLAN_TIME_BUCKET_SECONDS ("now" uses the current
+    bucket), with TTL eviction; requests reuse one pooled connection.
+    Concurrent callers asking for the same key share one in-flight request.
+    `local_fn` returns the offline RaptorPlanner (or None while it is loading);
+    its answers have the same shape and are cached under the same key.
+    """
+    def __init__(self, api_key, url=PLANNER_URL, cache_size=PLAN_CACHE_SIZE, cache_ttl=PLAN_CACHE_TTL,
+                 decimals=PLAN_COORD_DECIMALS, bucket_seconds=PLAN_TIME_BUCKET_SECONDS, timeout=10,
+                 local_fn=None, offline=OFFLINE_PLANNER):
+        self.url = url
+        self.local_fn = local_fn
+        self.offline = offline
+        self.decimals = decimals
+        self.bucket_seconds = bucket_seconds
+        self.timeout = timeout
+        self.http = requests.Session()
+        self.http.headers.update({"Content-Type": "application/json", "digitransit-subscription-key": api_key or ""})
+        self.cache = TTLCache(maxsize=cache_size, ttl_seconds=cache_ttl)
+        self.requests_made = 0
+        self.local_answers = 0
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def cache_key(self, start, end, departure_time=None):
+        when = departure_time.timestamp() if departure_time else time.time()
+        return (
+            round(float(start['lat']), self.decimals), round(float(start['lon']), self.decimals),
+            round(float(end['lat']), self.decimals), round(float(end['lon']), self.decimals),
+            departure_time is None, int(when // self.bucket_seconds),
+        )
+
+    def plan(self, start, end, departure_time=None):
+        """Itineraries (list of dicts) between two {'lat', 'lon'} places. Raises on request errors."""
+        key = self.cache_key(start, end, departure_time)
+        with self._lock:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+            pending = self._inflight.get(key)
+            owner = pending is None
+            if owner:
+                pending = self._inflight[key] = Future()
+        if not owner:
+            return pending.result()
+
+        try:
+            itineraries = self._resolve(key, start, end, departure_time)
+            self.cache.put(key, itineraries)
+            pending.set_result(itineraries)
+            return itineraries
+        except Exception as e:
+            pending.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def _resolve(self, key, start, end, departure_time):
+        local = self.local_fn() if self.local_fn and self.offline != "off" else None
+        if local is not None and self.offline == "prefer":
+            itineraries = self._plan_local(local, key, start, end, departure_time)
+            if itineraries:
+                return itineraries
+        try:
+            return self._fetch(key, departure_time)
+        except Exception as e:
+            if local is None or self.offline == "prefer":
+                raise
+            print(f"⚠️ Digitransit plan() failed ({e}); using the offline planner")
+            return self._plan_local(local, key, start, end, departure_time)
+
+    def _plan_local(self, local, key, start, end, departure_time):
+        # Same rounded coordinates as the remote query, so either answer fits the cache key
+        self.local_answers += 1
+        return local.plan(dict(start, lat=key[0], lon=key[1]), dict(end, lat=key[2], lon=key[3]),
+                          departure_time, PLAN_ITINERARIES)
+
+    def _fetch(self, key, departure_time):
+        time_mode = f'dateTime: "{departure_time.strftime("%Y-%m-%dT%H:%M:%S")}+02:00"' if departure_time else ""
+        query = PLAN_QUERY % (key[0], key[1], key[2], key[3], PLAN_ITINERARIES, time_mode)
+        resp = self.http.post(self.url, json={"query": query}, timeout=self.timeout)
+        self.requests_made += 1
+        resp.raise_for_status()
+        return resp.json()['data']['plan']['itineraries']
@@ -0,0 +1,539 @@
+import os
+import json
+import time
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+
+from etl_static import GTFS_PATH, MODE_MAP
+from spatial_index import GridIndex, haversine_np
+from route_geometry import encode_polyline
+from graph_snapshot import csr_gather
+
+TIMETABLE_SNAPSHOT = "raptor_timetable.npz"
+TIMETABLE_SOURCES = ("stops.txt", "routes.txt", "trips.txt", "stop_times.txt", "calendar.txt", "calendar_dates.txt")
+TIMETABLE_VERSION = 3
+
+MAX_ROUNDS = int(os.getenv("RAPTOR_MAX_ROUNDS", "5"))          # trips per journey (transfers + 1)
+ACCESS_RADIUS_M = float(os.getenv("RAPTOR_ACCESS_RADIUS_M", "600"))
+WALK_SPEED_MPS = float(os.getenv("RAPTOR_WALK_SPEED_MPS", "1.2"))
+CHANGE_SECONDS = int(os.getenv("RAPTOR_CHANGE_SECONDS", "60"))   # slack when changing vehicles
+WALK_RADIUS_METERS = float(os.getenv("WALK_RADIUS_METERS", "150"))
+
+# etl_static modes -> the mode names the Digitransit planner uses in legs
+PLANNER_MODES = {"TRAM": "TRAM", "METRO": "SUBWAY", "TRAIN": "RAIL", "FERRY": "FERRY", "BUS": "BUS"}
+WEEKDAYS = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+INF = np.iinfo(np.int32).max
+DAY_SECONDS = 86400
+
+
+def _strip_prefix(col):
+    # Ids repeat heavily in stop_times: clean each distinct value once
+    codes, uniques = pd.factorize(col, use_na_sentinel=False)
+    clean = np.array([str(u).replace("HSL:", "").strip() for u in uniques], dtype=object)
+    return pd.Series(clean[codes], index=col.index)
+
+
+def _gtfs_seconds(col):
+    """'HH:MM:SS' (hours may exceed 24) -> seconds after the service day's midnight, -1 if missing."""
+    codes, uniques = pd.factorize(col, use_na_sentinel=False)
+    secs = np.full(len(uniques), -1, dtype=np.int32)
+    for i, value in enumerate(uniques):
+        parts = str(value).strip().split(":")
+        if len(parts) == 3 and all(p.isdigit() for p in parts):
+            secs[i] = int(parts[0]) * 3600 + int(parts[1]) * 60 + int(parts[2])
+    return secs[codes]
+
+
+def _fifo_chains(dep, arr):
+    """
+    Splits trips (rows, sorted by first departure) into groups in which no
+    trip overtakes an earlier one: each later row departs and arrives no
+    earlier than its predecessor at every stop. Returns row index arrays.
+    """
+    if (np.diff(dep, axis=0) >= 0).all() and (np.diff(arr, axis=0) >= 0).all():
+        return [np.arange(len(dep))]
+    chains, lasts = [], []
+    for r in range(len(dep)):
+        fits = [c for c, last in enumerate(lasts) if (dep[r] >= dep[last]).all() and (arr[r] >= arr[last]).all()]
+        if fits:
+            chains[fits[0]].append(r)
+            lasts[fits[0]] = r
+        else:
+            chains.append([r])
+            lasts.append(r)
+    return [np.array(c) for c in chains]
+
+
+def _signature(gtfs_path):
+    sig = {}
+    for name in TIMETABLE_SOURCES:
+        path = os.path.join(gtfs_path, name)
+        if os.path.exists(path):
+            st = os.stat(path)
+            sig[name] = [st.st_size, st.st_mtime_ns]
+    return sig
+
+
+class Timetable:
+    """
+    Compact array form of a GTFS feed for RAPTOR.
+    Trips with the same route and stop sequence form a pattern; trips that
+    overtake another are split into further patterns, so every pattern is
+    FIFO (a later trip never arrives anywhere earlier). Per pattern, the stop
+    sequence is a slice of `pattern_stops` and the timetable is an
+    (n_trips, n_stops) block of `arr`/`dep` (flattened, row-major), trips
+    sorted by first departure. `stop_patterns` is a CSR index stop ->
+    (pattern, position). All times are seconds after service-day midnight,
+    so trips running past midnight have times beyond 24:00:00. Headsigns are
+    int32 codes per trip into the small `headsigns` table.
+    Trips whose route_id is not in routes.txt are dropped.
+    """
+    ARRAYS = ("stop_lat", "stop_lon", "stop_ids", "stop_names",
+              "pattern_stop_start", "pattern_n_stops", "pattern_stops",
+              "pattern_trip_start", "pattern_n_trips", "pattern_time_start", "pattern_route",
+              "trip_service", "trip_headsign", "headsigns", "arr", "dep",
+              "stop_pat_start", "stop_pat", "stop_pat_pos",
+              "route_short", "route_mode", "service_ids",
+              "cal_service", "cal_days", "cal_start", "cal_end", "exc_service", "exc_date", "exc_type")
+
+    def __init__(self, **arrays):
+        for name in self.ARRAYS:
+            setattr(self, name, arrays[name])
+        self.n_stops = len(self.stop_lat)
+        self.grid = GridIndex(self.stop_lat, self.stop_lon, cell_meters=ACCESS_RADIUS_M)
+        self.stop_index = {s: i for i, s in enumerate(self.stop_ids.tolist())}
+        self.last_arrival = int(self.arr.max()) if len(self.arr) else 0
+        self._active = {}
+
+    @classmethod
+    def from_gtfs(cls, gtfs_path=GTFS_PATH):
+        read = lambda name, dtype=str, **kw: pd.read_csv(os.path.join(gtfs_path, name), dtype=dtype, **kw)
+        stops = read("stops.txt", usecols=["stop_id", "stop_name", "stop_lat", "stop_lon"])
+        routes = read("routes.txt", usecols=lambda c: c in ("route_id", "route_short_name", "route_type"))
+        trips = read("trips.txt", usecols=lambda c: c in ("route_id", "service_id", "trip_id", "trip_headsign"))
+        st = read("stop_times.txt", usecols=["trip_id", "arrival_time", "departure_time", "stop_id", "stop_sequence"],
+                  dtype={"trip_id": str, "arrival_time": str, "departure_time": str, "stop_id": str, "stop_sequence": float})
+
+        stop_ids = _strip_prefix(stops["stop_id"])
+        stop_index = pd.Series(np.arange(len(stops)), index=stop_ids.to_numpy())
+        route_ids = _strip_prefix(routes["route_id"])
+        route_index = pd.Series(np.arange(len(routes)), index=route_ids.to_numpy())
+        route_short = (routes["route_short_name"] if "route_short_name" in routes else route_ids).fillna(route_ids)
+        route_type = routes["route_type"] if "route_type" in routes else pd.Series("3", index=routes.index)
+        route_mode = route_type.fillna("3").map(MODE_MAP).fillna("BUS").map(PLANNER_MODES)
+
+        trip_ids = _strip_prefix(trips["trip_id"])
+        trip_index = pd.Series(np.arange(len(trips)), index=trip_ids.to_numpy())
+        service_codes, service_ids = pd.factorize(trips["service_id"].fillna(""))
+        trip_route = route_index.reindex(_strip_prefix(trips["route_id"]).to_numpy()).fillna(-1).astype(np.int32).to_numpy()
+        headsign = trips["trip_headsign"].fillna("") if "trip_headsign" in trips else pd.Series("", index=trips.index)
+
+        # Stop times: map ids to indices, drop rows we cannot place, order by trip then sequence
+        t = trip_index.reindex(_strip_prefix(st["trip_id"]).to_numpy()).to_numpy()
+        s = stop_index.reindex(_strip_prefix(st["stop_id"]).to_numpy()).to_numpy()
+        dep = _gtfs_seconds(st["departure_time"])
+        arr = _gtfs_seconds(st["arrival_time"])
+        arr = np.where(arr < 0, dep, arr)
+        dep = np.where(dep < 0, arr, dep)
+        seq = st["stop_sequence"].to_numpy(float)
+        ok = ~np.isnan(t) & ~np.isnan(s) & ~np.isnan(seq) & (dep >= 0)
+        t, s, seq, arr, dep = t[ok].astype(np.int64), s[ok].astype(np.int32), seq[ok], arr[ok], dep[ok]
+        # Trips of unknown routes would otherwise share one route-less pattern
+        ok = trip_route[t] >= 0
+        t, s, seq, arr, dep = t[ok], s[ok], seq[ok], arr[ok], dep[ok]
+        order = np.lexsort((seq, t))
+        t, s, arr, dep = t[order], s[order], arr[order], dep[order]
+
+        # Group trips by identical stop sequence
+        bounds = np.flatnonzero(np.diff(t)) + 1
+        starts, ends = np.concatenate(([0], bounds)), np.concatenate((bounds, [len(t)]))
+        pattern_of = {}
+        members, lengths = [], []
+        for a, b in zip(starts.tolist(), ends.tolist()):
+            if b - a < 2:
+                continue
+            key = (int(trip_route[t[a]]), s[a:b].tobytes())
+            p = pattern_of.setdefault(key, len(members))
+            if p == len(members):
+                members.append([])
+                lengths.append(b - a)
+            members[p].append(a)
+
+        pattern_stops, pattern_stop_start, pattern_n_stops = [], [], []
+        pattern_trip_start, pattern_n_trips, pattern_time_start, pattern_route = [], [], [], []
+        trip_rows, arr_blocks, dep_blocks = [], [], []
+        n_stop_slots = n_trip_rows = n_time_slots = 0
+        for trip_starts, n in zip(members, lengths):
+            trip_starts = np.array(trip_starts)
+            trip_starts = trip_starts[np.argsort(dep[trip_starts], kind="stable")]
+            idx = trip_starts[:, None] + np.arange(n)[None, :]
+            for chain in _fifo_chains(dep[idx], arr[idx]):
+                a0 = trip_starts[chain[0]]
+                pattern_stops.append(s[a0:a0 + n])
+                pattern_stop_start.append(n_stop_slots)
+                pattern_n_stops.append(n)
+                pattern_trip_start.append(n_trip_rows)
+                pattern_n_trips.append(len(chain))
+                pattern_time_start.append(n_time_slots)
+                pattern_route.append(trip_route[t[a0]])
+                trip_rows.append(t[trip_starts[chain]])
+                arr_blocks.append(arr[idx[chain]].ravel())
+                dep_blocks.append(dep[idx[chain]].ravel())
+                n_stop_slots += n
+                n_trip_rows += len(chain)
+                n_time_slots += n * len(chain)
+
+        pattern_stops = np.concatenate(pattern_stops).astype(np.int32) if members else np.empty(0, np.int32)
+        trip_rows = np.concatenate(trip_rows) if members else np.empty(0, np.int64)
+        headsign_codes, headsigns = pd.factorize(headsign.to_numpy(dtype=object)[trip_rows])
+        pattern_of_slot = np.repeat(np.arange(len(pattern_n_stops)), pattern_n_stops)
+        pos_of_slot = np.arange(len(pattern_stops)) - np.repeat(pattern_stop_start, pattern_n_stops)
+        by_stop = np.argsort(pattern_stops, kind="stable")
+        stop_pat_start = np.searchsorted(pattern_stops[by_stop], np.arange(len(stops) + 1)).astype(np.int64)
+
+        cal = cls._calendar(gtfs_path, service_ids)
+        return cls(
+            stop_lat=pd.to_numeric(stops["stop_lat"]).to_numpy(float),
+            stop_lon=pd.to_numeric(stops["stop_lon"]).to_numpy(float),
+            stop_ids=stop_ids.to_numpy(dtype=str), stop_names=stops["stop_name"].fillna("").to_numpy(dtype=str),
+            pattern_stop_start=np.array(pattern_stop_start, np.int64), pattern_n_stops=np.array(pattern_n_stops, np.int32),
+            pattern_stops=pattern_stops,
+            pattern_trip_start=np.array(pattern_trip_start, np.int64), pattern_n_trips=np.array(pattern_n_trips, np.int32),
+            pattern_time_start=np.array(pattern_time_start, np.int64), pattern_route=np.array(pattern_route, np.int32),
+            trip_service=service_codes[trip_rows].astype(np.int32), trip_headsign=headsign_codes.astype(np.int32), headsigns=np.asarray(headsigns, dtype=str),
+            arr=np.concatenate(arr_blocks).astype(np.int32) if members else np.empty(0, np.int32),
+            dep=np.concatenate(dep_blocks).astype(np.int32) if members else np.empty(0, np.int32),
+            stop_pat_start=stop_pat_start, stop_pat=pattern_of_slot[by_stop].astype(np.int32),
+            stop_pat_pos=pos_of_slot[by_stop].astype(np.int32),
+            route_short=route_short.to_numpy(dtype=str), route_mode=route_mode.to_numpy(dtype=str),
+            service_ids=np.asarray(service_ids, dtype=str), **cal,
+        )
+
+    @staticmethod
+    def _calendar(gtfs_path, service_ids):
+        """calendar.txt weekday masks and calendar_dates.txt exceptions, as service-code arrays."""
+        code = {sid: i for i, sid in enumerate(service_ids)}
+        cal = {"cal_service": np.empty(0, np.int32), "cal_days": np.empty((0, 7), bool),
+               "cal_start": np.empty(0, np.int32), "cal_end": np.empty(0, np.int32),
+               "exc_service": np.empty(0, np.int32), "exc_date": np.empty(0, np.int32), "exc_type": np.empty(0, np.int8)}
+        path = os.path.join(gtfs_path, "calendar.txt")
+        if os.path.exists(path):
+            df = pd.read_csv(path, dtype=str)
+            df = df[df["service_id"].isin(code)]
+            cal.update(cal_service=df["service_id"].map(code).to_numpy(np.int32),
+                       cal_days=(df[list(WEEKDAYS)] == "1").to_numpy(),
+                       cal_start=df["start_date"].astype(np.int32).to_numpy(),
+                       cal_end=df["end_date"].astype(np.int32).to_numpy())
+        path = os.path.join(gtfs_path, "calendar_dates.txt")
+        if os.path.exists(path):
+            df = pd.read_csv(path, dtype=str)
+            df = df[df["service_id"].isin(code)]
+            cal.update(exc_service=df["service_id"].map(code).to_numpy(np.int32),
+                       exc_date=df["date"].astype(np.int32).to_numpy(),
+                       exc_type=df["exception_type"].astype(np.int8).to_numpy())
+        return cal
+
+    def active_trips(self, day):
+        """Boolean mask over trip rows running on `day` (all trips if the feed has no calendar)."""
+        key = day.toordinal()
+        if key not in self._active:
+            n_services = len(self.service_ids)
+            if not len(self.cal_service) and not len(self.exc_service):
+                running = np.ones(n_services, dtype=bool)
+            else:
+                ymd = int(day.strftime("%Y%m%d"))
+                running = np.zeros(n_services, dtype=bool)
+                on = (self.cal_start <= ymd) & (self.cal_end >= ymd) & self.cal_days[:, day.weekday()]
+                running[self.cal_service[on]] = True
+                hit = self.exc_date == ymd
+                running[self.exc_service[hit & (self.exc_type == 1)]] = True
+                running[self.exc_service[hit & (self.exc_type == 2)]] = False
+            if len(self._active) > 7:
+                self._active.clear()
+            self._active[key] = running[self.trip_service]
+        return self._active[key]
+
+    def save(self, path, signature):
+        tmp = path + ".tmp.npz"
+        np.savez(tmp, meta=np.array(json.dumps({"version": TIMETABLE_VERSION, "signature": signature})),
+                 **{name: getattr(self, name) for name in self.ARRAYS})
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path, signature):
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                meta = json.loads(str(data["meta"]))
+                if meta.get("version") != TIMETABLE_VERSION or meta.get("signature") != signature:
+                    return None
+                return cls(**{name: data[name] for name in cls.ARRAYS})
+        except (OSError, ValueError, KeyError):
+            return None
+
+    @classmethod
+    def load_or_build(cls, gtfs_path=GTFS_PATH):
+        """Arrays from the snapshot when the GTFS files are unchanged, else parsed (and snapshotted)."""
+        path = os.path.join(gtfs_path, TIMETABLE_SNAPSHOT)
+        signature = _signature(gtfs_path)
+        timetable = cls.load(path, signature)
+        if timetable is not None:
+            return timetable
+        started = time.perf_counter()
+        timetable = cls.from_gtfs(gtfs_path)
+        print(f"🚆 RAPTOR timetable: {len(timetable.pattern_n_stops)} patterns, "
+              f"{len(timetable.trip_service)} trips in {time.perf_counter() - started:.1f}s")
+        try:
+            timetable.save(path, signature)
+        except OSError as e:
+            print(f"⚠️ RAPTOR timetable snapshot not written: {e}")
+        return timetable
+
+
+class RaptorPlanner:
+    """
+    In-process earliest-arrival journey planner (RAPTOR) over a Timetable.
+    Round k scans every pattern serving a stop improved in round k-1, once,
+    with the boarding/alighting arithmetic done in NumPy per pattern; then
+    relaxes footpaths (WALKABLE_TO links). plan() returns itineraries shaped
+    like the Digitransit plan() answer, so it can stand in for the remote router.
+    Assumptions: boarding takes the first catchable trip, which is only right
+    because Timetable patterns are FIFO; and footpaths are relaxed one hop
+    from stops a vehicle reached this round (no walk-after-walk), so chains of
+    WALKABLE_TO links are only as good as the links' own transitive closure.
+    """
+    def __init__(self, timetable, walk_links=None, walk_radius=WALK_RADIUS_METERS):
+        self.tt = timetable
+        if walk_links is None:
+            # Same inference as etl_neo4j's WALKABLE_TO when the graph is not available
+            a, b, d = timetable.grid.pairs_within(walk_radius)
+            src, dst, dist = np.concatenate((a, b)), np.concatenate((b, a)), np.concatenate((d, d))
+        else:
+            # Graph ids carry the feed prefix ("HSL:1040601"); stops.txt ids do not
+            index = timetable.stop_index
+            rows = [(index[x], index[y], d) for x, y, d in
+                    ((str(a).replace("HSL:", ""), str(b).replace("HSL:", ""), float(d)) for a, b, d in walk_links)
+                    if x in index and y in index]
+            src = np.array([r[0] for r in rows] + [r[1] for r in rows], dtype=np.int64)
+            dst = np.array([r[1] for r in rows] + [r[0] for r in rows], dtype=np.int64)
+            dist = np.array([r[2] for r in rows] * 2, dtype=float)
+        order = np.argsort(src, kind="stable")
+        self.tr_start = np.searchsorted(src[order], np.arange(timetable.n_stops + 1))
+        self.tr_to = dst[order].astype(np.int32)
+        self.tr_secs = np.ceil(dist[order] / WALK_SPEED_MPS).astype(np.int32) + CHANGE_SECONDS
+
+    def _nearby(self, lat, lon):
+        idx, dist = self.tt.grid.query_radius(lat, lon, ACCESS_RADIUS_M)
+        return idx.astype(np.int64), np.ceil(dist / WALK_SPEED_MPS).astype(np.int64)
+
+    def _scan_pattern(self, p, tau_prev, best, active, slack, overnight=None):
+        """
+        Best trip of pattern `p` from every boardable stop. `overnight` is the
+        previous service day's active mask: its trips still running after
+        24:00 are included with their times shifted back by a day.
+        Returns (stops, arrivals, trip rows, day shifts, board positions, alight positions) or None.
+        """
+        tt = self.tt
+        n, m = int(tt.pattern_n_stops[p]), int(tt.pattern_n_trips[p])
+        stops = tt.pattern_stops[tt.pattern_stop_start[p]:tt.pattern_stop_start[p] + n]
+
+        ready = tau_prev[stops].astype(np.int64) + slack[stops]
+        can_board = ready < INF
+        can_board[-1] = False
+        if not can_board.any():
+            return None
+        block = slice(tt.pattern_time_start[p], tt.pattern_time_start[p] + n * m)
+        dep, arr = tt.dep[block].reshape(m, n), tt.arr[block].reshape(m, n)
+        trips = slice(tt.pattern_trip_start[p], tt.pattern_trip_start[p] + m)
+        rows = np.flatnonzero(active[trips])
+        shift = np.zeros(len(rows), dtype=np.int64)
+        if overnight is not None:
+            late = np.flatnonzero(overnight[trips] & (arr[:, -1] >= DAY_SECONDS))
+            if len(late):
+                rows = np.concatenate((late, rows))
+                shift = np.concatenate((np.full(len(late), DAY_SECONDS), shift))
+                order = np.argsort(dep[rows, 0] - shift, kind="stable")
+                rows, shift = rows[order], shift[order]
+        if not len(rows):
+            return None
+        dep, arr = dep[rows] - shift[:, None], arr[rows] - shift[:, None]
+        m = len(rows)
+
+        # First running trip catchable at each position (trips are FIFO within a pattern)
+        ok = (dep >= ready[None, :]) & can_board[None, :]
+        first = np.where(ok.any(axis=0), ok.argmax(axis=0), m)
+        trip = np.minimum.accumulate(first)
+        boarded_at = np.maximum.accumulate(np.where(first < np.concatenate(([m + 1], trip[:-1])), np.arange(n), -1))
+        # Alighting at j uses the best trip boarded strictly before j
+        trip, boarded_at = np.concatenate(([m], trip[:-1])), np.concatenate(([-1], boarded_at[:-1]))
+        riding = np.flatnonzero(trip < m)
+        if not len(riding):
+            return None
+        t_arr = arr[trip[riding], riding]
+        better = t_arr < best[stops[riding]]
+        if not better.any():
+            return None
+        j = riding[better]
+        return stops[j], t_arr[better], rows[trip[j]], shift[trip[j]], boarded_at[j], j
+
+    def search(self, lat0, lon0, lat1, lon1, depart_secs, day, max_rounds=MAX_ROUNDS):
+        """Runs the rounds; returns (tau per round, labels per round, access, egress)."""
+        tt = self.tt
+        active = tt.active_trips(day)
+        # Yesterday's trips matter only while some of them still run after midnight
+        overnight = tt.active_trips(day - timedelta(days=1)) if depart_secs < tt.last_arrival - DAY_SECONDS else None
+        n = tt.n_stops
+        best = np.full(n, INF, dtype=np.int64)
+        taus, labels = [], []
+
+        acc_idx, acc_secs = self._nearby(lat0, lon0)
+        tau = np.full(n, INF, dtype=np.int64)
+        tau[acc_idx] = depart_secs + acc_secs
+        best[acc_idx] = tau[acc_idx]
+        taus.append(tau)
+        labels.append(None)
+        marked = acc_idx
+        no_slack, change = np.zeros(n, dtype=np.int64), np.full(n, CHANGE_SECONDS, dtype=np.int64)
+
+        for k in range(1, max_rounds + 1):
+            tau_prev, tau = tau, np.full(n, INF, dtype=np.int64)
+            label = {"pattern": np.full(n, -1, np.int32), "trip": np.zeros(n, np.int32), "shift": np.zeros(n, np.int32),
+                     "board": np.zeros(n, np.int32), "alight": np.zeros(n, np.int32), "walk_from": np.full(n, -1, np.int32)}
+            if not len(marked):
+                break
+            slots = csr_gather(tt.stop_pat_start, marked)
+            improved = []
+            for p in np.unique(tt.stop_pat[slots]).tolist():
+                hit = self._scan_pattern(p, tau_prev, best, active, no_slack if k == 1 else change, overnight)
+                if hit is None:
+                    continue
+                # Latest first, so a stop a loop pattern visits twice keeps its earliest arrival
+                order = np.argsort(-hit[1], kind="stable")
+                stops, t_arr, trips, shifts, boards, alights = (a[order] for a in hit)
+                upd = t_arr < best[stops]
+                stops = stops[upd]
+                tau[stops] = t_arr[upd]
+                best[stops] = t_arr[upd]
+                label["pattern"][stops] = p
+                label["trip"][stops] = trips[upd]
+                label["shift"][stops] = shifts[upd]
+                label["board"][stops] = boards[upd]
+                label["alight"][stops] = alights[upd]
+                label["walk_from"][stops] = -1
+                improved.append(stops)
+            if not improved:
+                taus.append(tau)
+                labels.append(label)
+                break
+            by_vehicle = np.unique(np.concatenate(improved))
+
+            # Footpaths from stops reached by a vehicle in this round
+            counts = self.tr_start[by_vehicle + 1] - self.tr_start[by_vehicle]
+            if counts.sum():
+                edge = csr_gather(self.tr_start, by_vehicle)
+                frm = np.repeat(by_vehicle, counts)
+                to, t_walk = self.tr_to[edge], tau[frm] + self.tr_secs[edge]
+                order = np.argsort(-t_walk, kind="stable")
+                to, t_walk, frm = to[order], t_walk[order], frm[order]
+                upd = t_walk < best[to]
+                to, t_walk, frm = to[upd], t_walk[upd], frm[upd]
+                tau[to] = t_walk
+                best[to] = np.minimum(best[to], t_walk)
+                label["walk_from"][to] = frm
+                label["pattern"][to] = -1
+                marked = np.unique(np.concatenate((by_vehicle, to)))
+            else:
+                marked = by_vehicle
+            taus.append(tau)
+            labels.append(label)
+
+        return taus, labels, (acc_idx, acc_secs), self._nearby(lat1, lon1)
+
+    def plan(self, start, end, departure_time=None, num_itineraries=2):
+        """Pareto options (fewer vehicles vs earlier arrival), as Digitransit-style itinerary dicts."""
+        when = departure_time or datetime.now()
+        day = when.date()
+        midnight = datetime.combine(day, datetime.min.time())
+        depart = int((when - midnight).total_seconds())
+        lat0, lon0, lat1, lon1 = float(start['lat']), float(start['lon']), float(end['lat']), float(end['lon'])
+        taus, labels, (acc_idx, acc_secs), (egr_idx, egr_secs) = self.search(lat0, lon0, lat1, lon1, depart, day)
+        access = dict(zip(acc_idx.tolist(), acc_secs.tolist()))
+
+        options, best_arrival = [], INF
+        for k in range(1, len(taus)):
+            if not len(egr_idx):
+                break
+            total = taus[k][egr_idx] + egr_secs
+            i = int(np.argmin(total))
+            if total[i] < best_arrival:
+                best_arrival = int(total[i])
+                options.append((k, int(egr_idx[i]), int(egr_secs[i]), best_arrival))
+        # Best arrival first, then the fewer-transfer alternatives
+        options = options[::-1][:num_itineraries]
+        itineraries = [self._itinerary(taus, labels, access, k, s, egress, arrival, start, end, midnight, depart)
+                       for k, s, egress, arrival in options]
+
+        # Short hops: walking all the way can beat (or replace) riding
+        walk_secs = int(np.ceil(haversine_np(lat0, lon0, lat1, lon1) / WALK_SPEED_MPS))
+        if walk_secs <= 2 * ACCESS_RADIUS_M / WALK_SPEED_MPS and (not options or depart + walk_secs < best_arrival):
+            itineraries.insert(0, self._walk_only(start, end, midnight, depart, walk_secs))
+        return itineraries[:num_itineraries]
+
+    def _walk_only(self, start, end, midnight, depart, walk_secs):
+        ms = lambda secs: int((midnight + timedelta(seconds=int(secs))).timestamp() * 1000)
+        return {"duration": walk_secs, "startTime": ms(depart), "endTime": ms(depart + walk_secs), "source": "offline", "legs": [{
+            "mode": "WALK", "startTime": ms(depart), "endTime": ms(depart + walk_secs), "route": None,
+            "from": {"name": start.get("name", "Origin")}, "to": {"name": end.get("name", "Destination")},
+            "legGeometry": {"points": encode_polyline([[float(start["lon"]), float(start["lat"])],
+                                                       [float(end["lon"]), float(end["lat"])]])},
+        }]}
+
+    def _itinerary(self, taus, labels, access, k, stop, egress, arrival, start, end, midnight, depart):
+        tt = self.tt
+        legs = []
+        place = lambda s: {"name": str(tt.stop_names[s]), "lat": float(tt.stop_lat[s]), "lon": float(tt.stop_lon[s])}
+        ms = lambda secs: int((midnight + timedelta(seconds=int(secs))).timestamp() * 1000)
+
+        def walk(a, b, t0, t1):
+            return {"mode": "WALK", "startTime": ms(t0), "endTime": ms(t1), "route": None,
+                    "from": {"name": a["name"]}, "to": {"name": b["name"]},
+                    "legGeometry": {"points": encode_polyline([[a["lon"], a["lat"]], [b["lon"], b["lat"]]])}}
+
+        target = {"name": end.get("name", "Destination"), "lat": float(end["lat"]), "lon": float(end["lon"])}
+        legs.append(walk(place(stop), target, arrival - egress, arrival))
+        s = stop
+        while k > 0:
+            label = labels[k]
+            if label["walk_from"][s] >= 0 and label["pattern"][s] < 0:
+                f = int(label["walk_from"][s])
+                legs.append(walk(place(f), place(s), taus[k][f], taus[k][s]))
+                s = f
+                continue
+            p = int(label["pattern"][s])
+            n = int(tt.pattern_n_stops[p])
+            base = tt.pattern_time_start[p] + int(label["trip"][s]) * n
+            b, a = int(label["board"][s]), int(label["alight"][s])
+            seq = tt.pattern_stops[tt.pattern_stop_start[p] + b:tt.pattern_stop_start[p] + a + 1]
+            route, shift = int(tt.pattern_route[p]), int(label["shift"][s])
+            legs.append({
+                "mode": str(tt.route_mode[route]),
+                "startTime": ms(tt.dep[base + b] - shift), "endTime": ms(tt.arr[base + a] - shift),
+                "route": {"shortName": str(tt.route_short[route])},
+                "headsign": str(tt.headsigns[tt.trip_headsign[tt.pattern_trip_start[p] + int(label["trip"][s])]]),
+                "from": {"name": str(tt.stop_names[seq[0]])}, "to": {"name": str(tt.stop_names[seq[-1]])},
+                "legGeometry": {"points": encode_polyline(np.column_stack((tt.stop_lon[seq], tt.stop_lat[seq])))},
+            })
+            s = int(seq[0])
+            k -= 1
+        legs.append(walk({"name": start.get("name", "Origin"), "lat": float(start["lat"]), "lon": float(start["lon"])},
+                         place(s), depart, depart + access.get(s, 0)))
+        legs.reverse()
+        return {"duration": int(arrival - depart), "startTime": legs[0]["startTime"], "endTime": legs[-1]["endTime"],
+                "source": "offline", "legs": legs}
+
+
+def load_raptor_planner(gtfs_path=GTFS_PATH, walk_links=None):
+    """Timetable (snapshot-backed) plus transfers; None when the feed has no stop_times.txt."""
+    if not os.path.exists(os.path.join(gtfs_path, "stop_times.txt")):
+        return None
+    return RaptorPlanner(Timetable.load_or_build(gtfs_path), walk_links)
@@ -0,0 +1,68 @@
+import os
+import time
+import threading
+
+from graph_sync import read_generation
+
+# How often readers ask Neo4j whether the graph generation moved on
+GENERATION_CHECK_SECONDS = float(os.getenv("GRAPH_GENERATION_CHECK_SECONDS", "30"))
+
+
+class GraphReadModel:
+    """
+    Process-wide cache of views derived from the graph (topology snapshot, POI frame, gazetteer).
+    Every view is stored with the graph generation it was built from; the ETL
+    bumps that counter, so a view is rebuilt only after the graph actually changed.
+    The generation itself is re-read at most every `check_interval` seconds,
+    so a reader polling every tick does not turn into a query per tick.
+    """
+    def __init__(self, driver_fn, check_interval=GENERATION_CHECK_SECONDS):
+        self.driver_fn = driver_fn
+        self.check_interval = check_interval
+        self._generation = None
+        self._checked_at = 0.0
+        self._views = {}
+        self._lock = threading.RLock()
+        self.stats = {"hits": 0, "builds": 0, "generation_checks": 0}
+
+    def generation(self):
+        driver = self.driver_fn()
+        if not driver:
+            return None
+        with self._lock:
+            if not self._checked_at or time.monotonic() - self._checked_at >= self.check_interval:
+                try:
+                    self._generation = read_generation(driver)
+                    self.stats["generation_checks"] += 1
+                except Exception as e:
+                    # Keep serving the last known views while the database is unreachable
+                    print(f"⚠️ Graph generation check failed: {e}")
+                self._checked_at = time.monotonic()
+            return self._generation
+
+    def get(self, name, build_fn, default=None):
+        """
+        The view `name` for the current generation, building it with build_fn(driver)
+        on first use or after the graph changed. `default` until Neo4j is connected,
+        and whenever build_fn returns None (nothing is cached then).
+        """
+        generation = self.generation()
+        if generation is None:
+            return default
+        with self._lock:
+            cached = self._views.get(name)
+            if cached is not None and cached[0] == generation:
+                self.stats["hits"] += 1
+                return cached[1]
+            value = build_fn(self.driver_fn())
+            if value is None:
+                # Not available yet (e.g. still warming up): try again on the next read
+                return default
+            self._views[name] = (generation, value)
+            self.stats["builds"] += 1
+            return value
+
+    def invalidate(self):
+        """Forces a generation re-check on the next read (e.g. right after a reload in this process)."""
+        with self._lock:
+            self._checked_at = 0.0
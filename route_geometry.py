@@ -0,0 +1,114 @@
+import os
+import numpy as np
+
+from map_view import meters_per_pixel
+
+# Douglas-Peucker tolerance in screen pixels; converted to metres for the current zoom
+SIMPLIFY_TOLERANCE_PX = float(os.getenv("ROUTE_SIMPLIFY_TOLERANCE_PX", "1.5"))
+
+
+def decode_polylines(encoded):
+    """
+    Decodes a batch of Google-encoded polylines (precision 5) at once.
+    All strings are decoded as one byte array: chunk terminators split the
+    varints, shifts and zig-zag are applied in NumPy, and each leg's deltas
+    are accumulated from its own origin. Returns one (n, 2) [lon, lat] array per string.
+    """
+    if not encoded:
+        return []
+    data = [s.encode("ascii") for s in encoded]
+    chunks = np.frombuffer(b"".join(data), dtype=np.uint8).astype(np.int64) - 63
+    if not len(chunks):
+        return [np.empty((0, 2)) for _ in encoded]
+
+    last = (chunks & 0x20) == 0
+    value_id = np.concatenate(([0], np.cumsum(last)[:-1]))
+    starts = np.flatnonzero(np.concatenate(([True], last[:-1])))
+    position = np.arange(len(chunks)) - starts[value_id]
+    raw = np.bincount(value_id, weights=(chunks & 0x1f) << (5 * position)).astype(np.int64)
+    deltas = np.where(raw & 1, ~(raw >> 1), raw >> 1)
+
+    # A string may not end mid-value (truncated input would otherwise spill into the next one)
+    lengths = np.array([len(d) for d in data])
+    ends = np.cumsum(lengths)
+    if not last[ends[lengths > 0] - 1].all():
+        raise ValueError("truncated polyline")
+    # Values per string (two per vertex); empty strings get 0
+    string_id = np.repeat(np.arange(len(data)), lengths)
+    values_per = np.bincount(string_id[last], minlength=len(data))
+    if (values_per % 2).any():
+        raise ValueError("polyline with an odd number of values")
+    out = []
+    offset = 0
+    for count in values_per:
+        pairs = deltas[offset:offset + count].reshape(-1, 2)
+        offset += count
+        out.append(np.cumsum(pairs, axis=0)[:, ::-1] / 100000.0)
+    return out
+
+
+def encode_polyline(coords):
+    """Google-encodes an (n, 2) [lon, lat] sequence (precision 5); inverse of decode_polyline."""
+    coords = np.asarray(coords, dtype=float).reshape(-1, 2)
+    scaled = np.round(coords[:, ::-1] * 100000.0).astype(np.int64)
+    deltas = np.diff(scaled, axis=0, prepend=0).ravel()
+    out = []
+    for value in np.where(deltas < 0, ~(deltas << 1), deltas << 1).tolist():
+        while value >= 0x20:
+            out.append(chr((0x20 | (value & 0x1f)) + 63))
+            value >>= 5
+        out.append(chr(value + 63))
+    return "".join(out)
+
+
+def decode_polyline(polyline_str):
+    """Single polyline as [[lon, lat], ...] (the PathLayer format)."""
+    return decode_polylines([polyline_str])[0].tolist()
+
+
+def simplify_path(coords, tolerance_m):
+    """
+    Douglas-Peucker over an (n, 2) [lon, lat] array in a local metric projection.
+    Iterative with an explicit stack; each step measures a whole span at once.
+    """
+    coords = np.asarray(coords, dtype=float)
+    n = len(coords)
+    if n < 3 or tolerance_m <= 0:
+        return coords
+    lat0 = np.radians(coords[:, 1].mean())
+    xy = np.column_stack((coords[:, 0] * 111320.0 * np.cos(lat0), coords[:, 1] * 110540.0))
+
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        a, b = stack.pop()
+        if b - a < 2:
+            continue
+        seg = xy[b] - xy[a]
+        pts = xy[a + 1:b] - xy[a]
+        length = np.hypot(seg[0], seg[1])
+        if length == 0:
+            dist = np.hypot(pts[:, 0], pts[:, 1])
+        else:
+            dist = np.abs(seg[0] * pts[:, 1] - seg[1] * pts[:, 0]) / length
+        i = int(np.argmax(dist))
+        if dist[i] > tolerance_m:
+            k = a + 1 + i
+            keep[k] = True
+            stack.append((a, k))
+            stack.append((k, b))
+    return coords[keep]
+
+
+def simplify_segments(segments, zoom, tolerance_px=SIMPLIFY_TOLERANCE_PX):
+    """PathLayer segments ({'path', 'color'}) simplified to `tolerance_px` pixels at `zoom`."""
+    out = []
+    for seg in segments:
+        path = np.asarray(seg["path"], dtype=float)
+        if len(path) < 3:
+            out.append(seg)
+            continue
+        tolerance_m = tolerance_px * meters_per_pixel(path[:, 1].mean(), zoom)
+        out.append(dict(seg, path=simplify_path(path, tolerance_m).tolist()))
+    return out
@@ -0,0 +1,170 @@
+import math
+import numpy as np
+
+EARTH_RADIUS_M = 6371000.0  # Earth radius in meters
+METERS_PER_DEG_LAT = 111320.0
+
+
+def haversine_np(lat1, lon1, lat2, lon2):
+    """Vectorized great-circle distance in meters (broadcasts like NumPy)."""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(x, dtype=np.float64)) for x in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+class GridIndex:
+    """
+    Uniform lat/lon bucket grid over a point set.
+    Cells are roughly `cell_meters` wide, so radius queries only touch
+    the few buckets around a point instead of the whole set.
+    """
+    def __init__(self, lats, lons, cell_meters=150.0):
+        self.lats = np.asarray(lats, dtype=np.float64).ravel()
+        self.lons = np.asarray(lons, dtype=np.float64).ravel()
+        self.cell_meters = float(cell_meters)
+
+        # Size longitude cells at the widest |lat| so no cell is narrower than cell_meters
+        ref_lat = float(np.abs(self.lats).max()) if len(self.lats) else 60.17
+        self.cell_lat = self.cell_meters / METERS_PER_DEG_LAT
+        self.cell_lon = self.cell_meters / (METERS_PER_DEG_LAT * max(math.cos(math.radians(ref_lat)), 1e-6))
+
+        self.cells = {}
+        if len(self.lats):
+            rows, cols = self._cell_of(self.lats, self.lons)
+            order = np.lexsort((cols, rows))
+            keys = np.stack([rows[order], cols[order]], axis=1)
+            breaks = np.flatnonzero(np.any(np.diff(keys, axis=0) != 0, axis=1)) + 1
+            for chunk in np.split(order, breaks):
+                self.cells[(int(rows[chunk[0]]), int(cols[chunk[0]]))] = chunk
+
+    def __len__(self):
+        return len(self.lats)
+
+    def _cell_of(self, lats, lons):
+        rows = np.floor(np.asarray(lats, dtype=np.float64) / self.cell_lat).astype(np.int64)
+        cols = np.floor(np.asarray(lons, dtype=np.float64) / self.cell_lon).astype(np.int64)
+        return rows, cols
+
+    def _ring(self, radius):
+        return max(1, int(math.ceil(radius / self.cell_meters)))
+
+    def _gather(self, row, col, ring):
+        hits = [self.cells.get((row + dr, col + dc)) for dr in range(-ring, ring + 1) for dc in range(-ring, ring + 1)]
+        hits = [h for h in hits if h is not None]
+        return np.concatenate(hits) if hits else np.empty(0, dtype=np.int64)
+
+    def query_radius(self, lat, lon, radius):
+        """Returns (indices, distances) of indexed points within `radius` meters of (lat, lon)."""
+        rows, cols = self._cell_of(lat, lon)
+        cand = self._gather(int(rows), int(cols), self._ring(radius))
+        if not len(cand):
+            return cand, np.empty(0)
+        dist = haversine_np(lat, lon, self.lats[cand], self.lons[cand])
+        keep = dist < radius
+        return cand[keep], dist[keep]
+
+    def query_bbox(self, min_lat, min_lon, max_lat, max_lon):
+        """Indices of indexed points inside the lat/lon bounding box."""
+        (r0, r1), (c0, c1) = self._cell_of([min_lat, max_lat], [min_lon, max_lon])
+        if (r1 - r0 + 1) * (c1 - c0 + 1) > len(self.cells):
+            hits = [m for (r, c), m in self.cells.items() if r0 <= r <= r1 and c0 <= c <= c1]
+        else:
+            hits = [self.cells.get((r, c)) for r in range(r0, r1 + 1) for c in range(c0, c1 + 1)]
+            hits = [h for h in hits if h is not None]
+        if not hits:
+            return np.empty(0, dtype=np.int64)
+        cand = np.concatenate(hits)
+        lat, lon = self.lats[cand], self.lons[cand]
+        return cand[(lat >= min_lat) & (lat <= max_lat) & (lon >= min_lon) & (lon <= max_lon)]
+
+    def query_corridor(self, path_lats, path_lons, width):
+        """
+        Indices of indexed points within `width` meters of a polyline.
+        The line is densified to quarter-width steps and joined against the grid.
+        """
+        path_lats = np.asarray(path_lats, dtype=np.float64)
+        path_lons = np.asarray(path_lons, dtype=np.float64)
+        if not len(path_lats):
+            return np.empty(0, dtype=np.int64)
+
+        step = max(width / 4.0, 1.0)
+        seg = haversine_np(path_lats[:-1], path_lons[:-1], path_lats[1:], path_lons[1:])
+        lats, lons = [path_lats[:1]], [path_lons[:1]]
+        for i, length in enumerate(seg):
+            t = np.linspace(0.0, 1.0, int(math.ceil(length / step)) + 1)[1:]
+            lats.append(path_lats[i] + t * (path_lats[i + 1] - path_lats[i]))
+            lons.append(path_lons[i] + t * (path_lons[i + 1] - path_lons[i]))
+
+        _, hits, _ = self.pairs_between(np.concatenate(lats), np.concatenate(lons), width)
+        return np.unique(hits)
+
+    def pairs_between(self, lats, lons, radius):
+        """
+        Spatial join of query points against the indexed points.
+        Returns (query_idx, index_idx, distances) for every pair closer than `radius` meters.
+        Queries are grouped by cell so each neighbourhood is gathered once.
+        """
+        lats = np.asarray(lats, dtype=np.float64).ravel()
+        lons = np.asarray(lons, dtype=np.float64).ravel()
+        empty = np.empty(0, dtype=np.int64)
+        if not len(lats) or not len(self):
+            return empty, empty, np.empty(0)
+
+        ring = self._ring(radius)
+        rows, cols = self._cell_of(lats, lons)
+        order = np.lexsort((cols, rows))
+        keys = np.stack([rows[order], cols[order]], axis=1)
+        breaks = np.flatnonzero(np.any(np.diff(keys, axis=0) != 0, axis=1)) + 1
+
+        left, right = [], []
+        for queries in np.split(order, breaks):
+            cand = self._gather(int(rows[queries[0]]), int(cols[queries[0]]), ring)
+            if not len(cand):
+                continue
+            left.append(np.repeat(queries, len(cand)))
+            right.append(np.tile(cand, len(queries)))
+
+        if not left:
+            return empty, empty, np.empty(0)
+
+        q = np.concatenate(left)
+        c = np.concatenate(right)
+        dist = haversine_np(lats[q], lons[q], self.lats[c], self.lons[c])
+        keep = dist < radius
+        return q[keep], c[keep], dist[keep]
+
+    def pairs_within(self, radius):
+        """
+        All unordered pairs (i < j) of indexed points closer than `radius` meters.
+        Returns (i, j, distances) arrays. Each cell is only compared with itself
+        and its forward neighbours, so every pair is scored exactly once.
+        """
+        ring = self._ring(radius)
+        forward = [(dr, dc) for dr in range(0, ring + 1) for dc in range(-ring, ring + 1) if dr > 0 or dc >= 0]
+
+        left, right = [], []
+        for (row, col), members in self.cells.items():
+            for dr, dc in forward:
+                other = members if (dr, dc) == (0, 0) else self.cells.get((row + dr, col + dc))
+                if other is None:
+                    continue
+                a = np.repeat(members, len(other))
+                b = np.tile(other, len(members))
+                if (dr, dc) == (0, 0):
+                    mask = a < b
+                    a, b = a[mask], b[mask]
+                left.append(a)
+                right.append(b)
+
+        if not left:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty, np.empty(0)
+
+        a = np.concatenate(left)
+        b = np.concatenate(right)
+        dist = haversine_np(self.lats[a], self.lons[a], self.lats[b], self.lons[b])
+        keep = dist < radius
+        a, b, dist = a[keep], b[keep], dist[keep]
+        swap = a > b
+        a[swap], b[swap] = b[swap], a[swap]
+        return a, b, dist
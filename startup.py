@@ -0,0 +1,111 @@
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Minimum pause before a failed task may be resubmitted
+WARMUP_RETRY_SECONDS = float(os.getenv("WARMUP_RETRY_SECONDS", "30"))
+
+
+class Warmup:
+    """
+    Runs independent start-up tasks (model load, GTFS parse, POI index, ...)
+    concurrently in background threads so the UI can render immediately.
+    Every task's wall time is recorded for the cold-start timing report.
+    A failed task stays failed (not "still running") until retry() resubmits it.
+    """
+    def __init__(self, max_workers=4, retry_seconds=WARMUP_RETRY_SECONDS):
+        self.started = time.perf_counter()
+        self.retry_seconds = retry_seconds
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="warmup")
+        self._futures = {}
+        self._tasks = {}
+        self._failed_at = {}
+        self._lock = threading.RLock()
+        self.timings = {}
+        self.errors = {}
+
+    def record(self, name, seconds):
+        """Adds an externally measured cost (e.g. module imports) to the report."""
+        self.timings[name] = seconds
+
+    def submit(self, name, fn, *args):
+        def run():
+            t0 = time.perf_counter()
+            try:
+                return fn(*args)
+            except Exception as e:
+                self.errors[name] = str(e)
+                self._failed_at[name] = time.monotonic()
+                raise
+            finally:
+                self.timings[name] = time.perf_counter() - t0
+
+        with self._lock:
+            self.errors.pop(name, None)
+            self._tasks[name] = (fn, args)
+            future = self._pool.submit(run)
+            self._futures[name] = future
+        future.add_done_callback(lambda _: self._maybe_print_report())
+        return future
+
+    def ready(self, name):
+        future = self._futures.get(name)
+        return future is not None and future.done() and future.exception() is None
+
+    def failed(self, name):
+        future = self._futures.get(name)
+        return future is not None and future.done() and future.exception() is not None
+
+    def retry(self, name):
+        """
+        Resubmits a failed task with its original arguments, at most once per
+        `retry_seconds`. Returns True if it was resubmitted.
+        """
+        # Check and resubmit under one lock, so concurrent callers start a single rerun
+        with self._lock:
+            if not self.failed(name) or time.monotonic() - self._failed_at.get(name, 0.0) < self.retry_seconds:
+                return False
+            fn, args = self._tasks[name]
+            self.submit(name, fn, *args)
+        return True
+
+    def done(self):
+        return all(f.done() for f in self._futures.values())
+
+    def result(self, name, default=None, timeout=0):
+        """
+        Task result without blocking by default; `default` while it is still
+        running or if it failed. Pass timeout=None to wait (e.g. inside another task).
+        """
+        future = self._futures.get(name)
+        if future is None:
+            return default
+        try:
+            return future.result(timeout=timeout)
+        except Exception:
+            return default
+
+    def report(self):
+        """Rows of (component, seconds, status), slowest first."""
+        rows = []
+        for name, seconds in self.timings.items():
+            future = self._futures.get(name)
+            if name in self.errors:
+                status = f"failed: {self.errors[name]}"
+            elif future is not None and not future.done():
+                status = "running"
+            else:
+                status = "ok"
+            rows.append((name, seconds, status))
+        for name, future in self._futures.items():
+            if name not in self.timings:
+                rows.append((name, time.perf_counter() - self.started, "running"))
+        return sorted(rows, key=lambda r: -r[1])
+
+    def _maybe_print_report(self):
+        if not self.done():
+            return
+        print(f"⏱️ Warm-up finished in {time.perf_counter() - self.started:.2f}s")
+        for name, seconds, status in self.report():
+            print(f"   {name:<16} {seconds:7.2f}s  {status}")